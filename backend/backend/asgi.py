@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Load the food classifier now, so a preloading server (gunicorn
+# --preload) shares the warmed-up weights with all forked workers
+from image_api.warmup import preload  # noqa: E402
+
+preload()
@@ -0,0 +1,26 @@
+# Gunicorn settings for serving the backend
+#
+#   gunicorn -c backend/gunicorn.conf.py
+#
+# preload_app imports backend.wsgi in the master process, which loads and
+# warms up the food classifier (see image_api/warmup.py) before the workers
+# are forked. The workers then share the read-only weight pages instead of
+# each loading their own copy on the first request.
+import multiprocessing
+import os
+
+wsgi_app = 'backend.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = True
+
+workers = int(os.environ.get('GUNICORN_WORKERS', max(2, multiprocessing.cpu_count() // 2)))
+# Threads let concurrent uploads in a worker be grouped by the batching engine
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 120
+
+
+def post_fork(server, worker):
+    # Each worker gets an even share of the CPU for torch's intra-op threads
+    import torch
+    torch.set_num_threads(max(1, multiprocessing.cpu_count() // workers))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -84,6 +85,15 @@ DATABASES = {
     }
 }
 
+# Shared by every worker on this host (the dish catalog is cached here).
+# Use Redis or Memcached when running on more than one host.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': Path(tempfile.gettempdir()) / 'ahaarsathi_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -125,6 +135,10 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = Path.joinpath(BASE_DIR, 'media')
 
+# Keep phone photos in memory during upload so inference can decode them
+# without touching disk (Django spools anything larger to a temp file)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -158,4 +172,52 @@ DJOSER = {
 }
 
 # Email backend for development
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Image recognition settings (see image_api/conf.py for all options)
+IMAGE_API = {
+    'BATCHING_ENABLED': True,
+    'BATCH_MAX_SIZE': 8,
+    'BATCH_MAX_WAIT_MS': 5,
+    'ASYNC_UPLOADS': False,
+    'ASYNC_WORKERS': 4,
+    'ASYNC_QUEUE_SIZE': 64,
+    'PREDICTION_CACHE_ENABLED': True,
+    'PREDICTION_CACHE_SIZE': 1024,
+    'PREDICTION_CACHE_MODE': 'exact',
+    'PREDICTION_CACHE_MAX_DISTANCE': 4,
+    'INFERENCE_BACKEND': 'pytorch',
+    'INFERENCE_INT8': False,
+    'PREDICTION_TOP_K_MAX': 5,
+    'EXPECTED_NUTRITION': False,
+    # e.g. {'subset': '../ml_model/models/food_classifier_subset/weights/best.pt'}
+    'MODEL_VERSIONS': {},
+    'TRAFFIC_SPLIT': {},
+    'SHADOW_MODEL': None,
+    'SHADOW_SAMPLE_RATE': 0.0,
+    'PRELOAD_MODEL': True,
+    'WARMUP_ITERATIONS': 2,
+    'BULK_NUTRITION_MAX_ITEMS': 1000,
+    'NUTRITION_SOURCE': 'database',
+    'DISH_CATALOG_CACHE': 'default',
+    'DISH_CATALOG_CHECK_SECONDS': 1.0,
+    'INGEST_ENABLED': True,
+    'INGEST_MAX_SIDE': 1600,
+    'INGEST_FORMAT': 'webp',
+    'INGEST_QUALITY': 80,
+    'INGEST_KEEP_ORIGINAL': False,
+    'INGEST_WORKERS': 2,
+    'INGEST_QUEUE_SIZE': 16,
+    'THUMBNAIL_SIZES': {'small': 160, 'medium': 480},
+    'THUMBNAIL_FORMAT': 'webp',
+    'THUMBNAIL_QUALITY': 75,
+    'THUMBNAIL_EAGER': True,
+}
+
+# Nutrition log settings (see data_api/conf.py for all options)
+DATA_API = {
+    'DASHBOARD_CACHE': 'default',
+    'DASHBOARD_CACHE_SECONDS': 300,
+    'DASHBOARD_WEEK_DAYS': 7,
+    'BULK_SUBMIT_MAX_ITEMS': 5000,
+}
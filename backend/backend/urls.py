@@ -21,11 +21,14 @@ from django.conf.urls.static import static
 from django.conf import settings
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from data_api.views import DashboardView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('image/', include("image_api.urls")),
     path('data/', include("data_api.urls")),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
     
@@ -1,9 +1,15 @@
 from django.contrib import admin
-from .models import DataEntry
+from .models import DailyNutritionRollup, DataEntry
 
 @admin.register(DataEntry)
 class DataEntryAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'timestamp')
     list_filter = ('user',)
     search_fields = ('id', 'user__username')
-    readonly_fields = ('timestamp',)
\ No newline at end of file
+    readonly_fields = ('timestamp',)
+
+@admin.register(DailyNutritionRollup)
+class DailyNutritionRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'entry_count')
+    list_filter = ('user',)
+    search_fields = ('user__username',)
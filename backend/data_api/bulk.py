@@ -0,0 +1,91 @@
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .dashboard import invalidate_dashboard
+from .models import DataEntry
+from .rollups import apply_entries
+from .serializers import DataEntryItemSerializer
+
+# Keys looked up per query, well below SQLite's bound parameter limit
+KEY_CHUNK_SIZE = 500
+
+
+def existing_keys(user, keys):
+    """Ids of the user's entries already stored under these idempotency keys"""
+    keys = list(keys)
+    found = {}
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        found.update(
+            DataEntry.objects.filter(user=user, idempotency_key__in=keys[start:start + KEY_CHUNK_SIZE])
+            .values_list('idempotency_key', 'id')
+        )
+    return found
+
+
+def submit_entries(user, items, batch_size=500):
+    """
+    Validate and store a batch of entries for a user
+
+    Valid items are inserted with one bulk_create() in a single transaction.
+    Items whose idempotency key was stored before, or appears earlier in the
+    batch, are reported as duplicates of that entry instead of being stored
+    again. bulk_create() sends no signals, so the daily rollups and the
+    dashboard cache are updated here.
+
+    Args:
+        user: Owner of the entries
+        items: Entry dictionaries as submitted
+        batch_size: Rows per INSERT statement
+
+    Returns:
+        List with one result per item, in order, each with a status of
+        'created', 'duplicate' or 'invalid'
+    """
+    child = DataEntryItemSerializer()
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            data = child.run_validation(item)
+        except ValidationError as exc:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': exc.detail}
+            continue
+        data.setdefault('idempotency_key', None)
+        valid.append((index, data))
+
+    # A concurrent retry of the same batch can store a key between the
+    # lookup and the insert; the unique constraint catches it and the
+    # lookup is repeated once
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                stored = existing_keys(user, {data['idempotency_key'] for _, data in valid if data['idempotency_key']})
+                pending = {}
+                new = []
+                for index, data in valid:
+                    key = data['idempotency_key']
+                    if key in stored or key in pending:
+                        results[index] = {'index': index, 'status': 'duplicate', 'idempotency_key': key}
+                        continue
+                    entry = DataEntry(user=user, **data)
+                    if key:
+                        pending[key] = entry
+                    new.append((index, entry))
+
+                DataEntry.objects.bulk_create([entry for _, entry in new], batch_size=batch_size)
+                apply_entries([entry for _, entry in new])
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    for index, entry in new:
+        results[index] = {'index': index, 'status': 'created', 'id': entry.id, 'idempotency_key': entry.idempotency_key}
+    for result in results:
+        if result['status'] == 'duplicate':
+            key = result['idempotency_key']
+            result['id'] = stored[key] if key in stored else pending[key].id
+
+    if new:
+        transaction.on_commit(lambda: invalidate_dashboard(user.id))
+    return results
@@ -0,0 +1,19 @@
+from django.conf import settings
+
+# Defaults for the DATA_API settings dictionary, override any of them in
+# backend/settings.py
+DEFAULTS = {
+    # Cache alias and lifetime of the per-user dashboard; a user's entry is
+    # dropped as soon as they submit or delete data
+    'DASHBOARD_CACHE': 'default',
+    'DASHBOARD_CACHE_SECONDS': 300,
+    # Days listed in the weekly summary, ending today
+    'DASHBOARD_WEEK_DAYS': 7,
+    # Most entries accepted by one bulk submission
+    'BULK_SUBMIT_MAX_ITEMS': 5000,
+}
+
+
+def get_setting(name):
+    """Return a DATA_API setting, falling back to the default"""
+    return getattr(settings, 'DATA_API', {}).get(name, DEFAULTS[name])
@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .conf import get_setting
+from .models import DataEntry
+from .rollups import NUTRIENTS, day_start
+
+# Atwater factors, kcal per gram
+CALORIES = ExpressionWrapper(
+    F('protein') * 4 + F('carbs') * 4 + F('fat') * 9,
+    output_field=DecimalField(max_digits=12, decimal_places=3),
+)
+
+
+def _cache():
+    return caches[get_setting('DASHBOARD_CACHE')]
+
+
+def _cache_key(user_id):
+    return f"data_api:dashboard:{user_id}"
+
+
+def _totals():
+    """Aggregates computed for every group of entries"""
+    return {
+        'entry_count': Count('id'),
+        'calories': Sum(CALORIES),
+        **{name: Sum(name) for name in NUTRIENTS},
+    }
+
+
+def _numbers(row):
+    """Group aggregates as JSON numbers, zero for empty groups"""
+    return {
+        'entry_count': row.get('entry_count') or 0,
+        'calories': round(float(row.get('calories') or 0), 1),
+        **{name: round(float(row.get(name) or 0), 3) for name in NUTRIENTS},
+    }
+
+
+def _summary_totals(numbers):
+    """
+    Aggregates of a whole summary, with the calorie total named as in the
+    /dashboard/ contract (api_structure.md); rows of days and weeks keep
+    the plain calories key
+    """
+    totals = dict(numbers)
+    totals['total_calories'] = totals.pop('calories')
+    return totals
+
+
+def build_dashboard(user_id, today=None):
+    """
+    Daily, weekly and monthly nutrition summaries of a user
+
+    Everything is summed by the database, grouped by day for the last
+    DASHBOARD_WEEK_DAYS days, and by week and month for the current month,
+    so only a few dozen aggregate rows leave it whatever the history size.
+
+    Args:
+        user_id: Owner of the entries
+        today: Date the summaries end on, default today in the project time zone
+
+    Returns:
+        Dictionary with daily_summary, weekly_summary and monthly_summary
+    """
+    today = today or timezone.localdate()
+    tzinfo = timezone.get_current_timezone()
+    week_start = today - timedelta(days=get_setting('DASHBOARD_WEEK_DAYS') - 1)
+    month_start = today.replace(day=1)
+    end = day_start(today + timedelta(days=1))
+    entries = DataEntry.objects.filter(user_id=user_id, timestamp__lt=end)
+
+    days = {
+        row['day']: _numbers(row)
+        for row in entries.filter(timestamp__gte=day_start(week_start))
+        .annotate(day=TruncDate('timestamp', tzinfo=tzinfo))
+        .values('day').annotate(**_totals()).order_by()
+    }
+    month_entries = entries.filter(timestamp__gte=day_start(month_start))
+    weeks = (
+        month_entries.annotate(week=TruncWeek('timestamp', tzinfo=tzinfo))
+        .values('week').annotate(**_totals()).order_by('week')
+    )
+    month = (
+        month_entries.annotate(month=TruncMonth('timestamp', tzinfo=tzinfo))
+        .values('month')
+        .annotate(days_logged=Count(TruncDate('timestamp', tzinfo=tzinfo), distinct=True), **_totals())
+        .order_by('month')
+        .first()
+    ) or {}
+
+    week_days = [week_start + timedelta(days=offset) for offset in range((today - week_start).days + 1)]
+    week_rows = [{'date': day, **days.get(day, _numbers({}))} for day in week_days]
+    logged_days = [row for row in week_rows if row['entry_count']]
+    days_logged = month.get('days_logged') or 0
+    monthly = _numbers(month)
+
+    return {
+        'daily_summary': {
+            'date': today,
+            **_summary_totals(days.get(today, _numbers({}))),
+        },
+        'weekly_summary': {
+            'start_date': week_start,
+            'end_date': today,
+            'average_daily_calories': round(
+                sum(row['calories'] for row in logged_days) / len(logged_days), 1,
+            ) if logged_days else 0,
+            'days': week_rows,
+        },
+        'monthly_summary': {
+            'month': month_start.strftime('%B %Y'),
+            'days_logged': days_logged,
+            'average_daily_calories': round(monthly['calories'] / days_logged, 1) if days_logged else 0,
+            **_summary_totals(monthly),
+            'weeks': [
+                {'week_start': timezone.localdate(row['week'], tzinfo), **_numbers(row)}
+                for row in weeks
+            ],
+        },
+    }
+
+
+def get_dashboard(user_id):
+    """
+    Dashboard of a user, from the cache when still current
+
+    A cached dashboard is reused until the user's entries change (see
+    signals.py), it expires or the day ends.
+    """
+    today = timezone.localdate()
+    cached = _cache().get(_cache_key(user_id))
+    if cached is not None and cached['date'] == today:
+        return cached['dashboard']
+
+    dashboard = build_dashboard(user_id, today)
+    _cache().set(
+        _cache_key(user_id), {'date': today, 'dashboard': dashboard},
+        timeout=get_setting('DASHBOARD_CACHE_SECONDS'),
+    )
+    return dashboard
+
+
+def invalidate_dashboard(user_id):
+    _cache().delete(_cache_key(user_id))
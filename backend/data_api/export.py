@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from image_api.models import ImageUpload
+
+from .models import DataEntry
+
+# Model and exported columns of each kind of history
+EXPORTS = {
+    'entries': (DataEntry, (
+        'id', 'user_id', 'timestamp', 'protein', 'carbs', 'fat', 'vitamins', 'minerals', 'idempotency_key',
+    )),
+    'images': (ImageUpload, (
+        'id', 'user_id', 'timestamp', 'prediction_id', 'status', 'prediction', 'prediction_detail',
+        'image', 'original_bytes', 'stored_bytes',
+    )),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Output is handed on in pieces of about this many bytes, not per row
+BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(kind, users=None, chunk_size=2000):
+    """
+    Rows of one kind of history as tuples, read from the database in chunks
+
+    Uses values_list() with iterator(), so no model instances are built and
+    at most chunk_size rows are held at once (a server-side cursor where the
+    database supports one).
+
+    Args:
+        kind: A key of EXPORTS
+        users: Only rows of these user ids, default everyone
+        chunk_size: Rows fetched from the database at a time
+    """
+    model, columns = EXPORTS[kind]
+    rows = model.objects.all()
+    if users is not None:
+        rows = rows.filter(user_id__in=users)
+    return rows.order_by('id').values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def _csv_value(value):
+    # JSON columns as JSON text and times in ISO 8601, as in the NDJSON export
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(value) for value in row])
+        yield buffer.getvalue()
+
+
+def _ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def render_export(kind, file_format, users=None, chunk_size=2000):
+    """
+    Generate an export as text pieces, CSV with a header row or NDJSON
+
+    Suitable for StreamingHttpResponse or writing to a file; nothing but the
+    current chunk of rows and one output buffer is kept in memory.
+    """
+    columns = EXPORTS[kind][1]
+    rows = export_rows(kind, users=users, chunk_size=chunk_size)
+    lines = _csv_lines(columns, rows) if file_format == 'csv' else _ndjson_lines(columns, rows)
+
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
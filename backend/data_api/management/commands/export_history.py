@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from data_api.export import EXPORTS, FORMATS, render_export
+
+
+class Command(BaseCommand):
+    help = "Stream nutrition entries or image uploads to a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help='History to export')
+        parser.add_argument('--format', dest='file_format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable)')
+        parser.add_argument('--output', help='File to write, default standard output')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        pieces = render_export(
+            options['kind'], options['file_format'], users=options['users'], chunk_size=options['chunk_size'],
+        )
+        if not options['output']:
+            for piece in pieces:
+                sys.stdout.write(piece)
+            return
+
+        written = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+            for piece in pieces:
+                written += f.write(piece)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {written} characters to {options['output']}"))
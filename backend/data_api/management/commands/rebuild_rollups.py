@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from data_api.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily nutrition rollups from the DataEntry rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable)')
+        parser.add_argument('--since', help='Only days from this date on (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rollups inserted per query')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+        written = rebuild(users=options['users'], since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily rollups"))
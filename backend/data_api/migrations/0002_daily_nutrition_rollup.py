@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('protein', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('carbs', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('fat', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('vitamins', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('minerals', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 09:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_api', '0002_daily_nutrition_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataentry',
+            index=models.Index(fields=['user', 'timestamp'], name='dataentry_user_timestamp'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 09:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_api', '0003_dataentry_user_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataentry',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='dataentry',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_dataentry_idempotency_key'),
+        ),
+    ]
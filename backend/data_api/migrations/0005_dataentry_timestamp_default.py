@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 09:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_api', '0004_dataentry_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataentry',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 14:40
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Kept in step with rollups.NUTRIENTS, which works on the current models
+NUTRIENTS = ('protein', 'carbs', 'fat', 'vitamins', 'minerals')
+
+
+def backfill_rollups(apps, schema_editor):
+    # Rollups are only maintained incrementally from 0002 on, so entries
+    # logged before then are counted here; same as rollups.rebuild()
+    DataEntry = apps.get_model('data_api', 'DataEntry')
+    DailyNutritionRollup = apps.get_model('data_api', 'DailyNutritionRollup')
+    totals = (
+        DataEntry.objects.annotate(date=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+        .values('user_id', 'date')
+        .annotate(entry_count=Count('id'), **{name: Sum(name) for name in NUTRIENTS})
+        .order_by()
+    )
+    DailyNutritionRollup.objects.all().delete()
+    batch = []
+    for row in totals.iterator(chunk_size=1000):
+        batch.append(DailyNutritionRollup(**row))
+        if len(batch) >= 1000:
+            DailyNutritionRollup.objects.bulk_create(batch)
+            batch = []
+    DailyNutritionRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_api', '0005_dataentry_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
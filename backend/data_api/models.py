@@ -1,17 +1,50 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class DataEntry(models.Model):
     """Model for storing JSON data with timestamp"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_entries')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the food was logged; bulk submissions of offline logs set it
+    timestamp = models.DateTimeField(default=timezone.now)
     protein = models.DecimalField(max_digits=7, decimal_places=3)
     carbs = models.DecimalField(max_digits=7, decimal_places=3)
     fat = models.DecimalField(max_digits=7, decimal_places=3)
     vitamins = models.DecimalField(max_digits=7, decimal_places=3)
     minerals = models.DecimalField(max_digits=7, decimal_places=3)
+    # Chosen by the client, so a retried bulk submission is not stored twice
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # A user's entries in a time range, in order (list and exports)
+            models.Index(fields=['user', 'timestamp'], name='dataentry_user_timestamp'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_dataentry_idempotency_key'),
+        ]
 
     def __str__(self):
         return f"DataEntry {self.id} - {self.timestamp}"
 
+class DailyNutritionRollup(models.Model):
+    """Per-user totals of the DataEntry rows logged on one day, kept up to date by signals"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    entry_count = models.PositiveIntegerField(default=0)
+    protein = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    carbs = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    fat = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    vitamins = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    minerals = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_rollup'),
+        ]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Rollup {self.user_id} - {self.date}"
+
 # Create your models here.
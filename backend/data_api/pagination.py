@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DataEntryCursorPagination(CursorPagination):
+    """
+    Keyset pagination of DataEntry rows in time order
+
+    Each page continues from the last (timestamp, id) of the previous one,
+    so it is a single range read on the (user, timestamp) index however deep
+    the client pages, and no COUNT query is needed.
+    """
+    ordering = ('timestamp', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
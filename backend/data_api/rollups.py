@@ -0,0 +1,118 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyNutritionRollup, DataEntry
+
+NUTRIENTS = ('protein', 'carbs', 'fat', 'vitamins', 'minerals')
+
+
+def entry_date(entry):
+    """Day an entry counts towards, in the project time zone"""
+    return timezone.localdate(entry.timestamp)
+
+
+def day_start(date):
+    """Aware datetime at which a day starts in the project time zone"""
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def apply_entries(entries, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) entries from the daily rollups
+
+    Entries are grouped by user and day first, so each affected rollup is
+    written once with an UPDATE ... SET x = x + delta, which stays correct
+    under concurrent submissions. Rollups left without entries are deleted.
+
+    Args:
+        entries: DataEntry instances, with their timestamps set
+        sign: 1 for new entries, -1 for deleted ones
+    """
+    deltas = defaultdict(lambda: {'entry_count': 0, **{name: Decimal(0) for name in NUTRIENTS}})
+    for entry in entries:
+        delta = deltas[(entry.user_id, entry_date(entry))]
+        delta['entry_count'] += sign
+        for name in NUTRIENTS:
+            delta[name] += sign * Decimal(getattr(entry, name))
+
+    with transaction.atomic():
+        for (user_id, date), delta in deltas.items():
+            changes = {name: F(name) + value for name, value in delta.items()}
+            if DailyNutritionRollup.objects.filter(user_id=user_id, date=date).update(**changes):
+                continue
+            if sign < 0:
+                # Nothing to subtract from, e.g. entries older than the rollups
+                continue
+            try:
+                with transaction.atomic():
+                    DailyNutritionRollup.objects.create(user_id=user_id, date=date, **delta)
+            except IntegrityError:
+                # Created by a concurrent submission for the same day
+                DailyNutritionRollup.objects.filter(user_id=user_id, date=date).update(**changes)
+        if sign < 0:
+            for user_id, date in deltas:
+                DailyNutritionRollup.objects.filter(user_id=user_id, date=date, entry_count__lte=0).delete()
+
+
+def daily_totals(entries):
+    """DataEntry rows summed per user and day by the database"""
+    return (
+        entries.annotate(date=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+        .values('user_id', 'date')
+        .annotate(entry_count=Count('id'), **{name: Sum(name) for name in NUTRIENTS})
+        .order_by()
+    )
+
+
+def rebuild_day(user_id, date):
+    """Recompute one rollup from its entries, e.g. after an entry was edited"""
+    entries = DataEntry.objects.filter(
+        user_id=user_id, timestamp__gte=day_start(date), timestamp__lt=day_start(date + timedelta(days=1)),
+    )
+    totals = list(daily_totals(entries))
+    with transaction.atomic():
+        DailyNutritionRollup.objects.filter(user_id=user_id, date=date).delete()
+        if totals:
+            DailyNutritionRollup.objects.create(**totals[0])
+
+
+def rebuild(users=None, since=None, batch_size=1000):
+    """
+    Recompute rollups from DataEntry with one grouped query
+
+    Args:
+        users: Only these user ids, default everyone
+        since: Only days from this date on, default all history
+        batch_size: Rollups inserted per query
+
+    Returns:
+        Number of rollups written
+    """
+    entries = DataEntry.objects.all()
+    rollups = DailyNutritionRollup.objects.all()
+    if users is not None:
+        entries = entries.filter(user_id__in=users)
+        rollups = rollups.filter(user_id__in=users)
+    if since is not None:
+        entries = entries.filter(timestamp__gte=day_start(since))
+        rollups = rollups.filter(date__gte=since)
+
+    with transaction.atomic():
+        rollups.delete()
+        written = 0
+        batch = []
+        for totals in daily_totals(entries).iterator(chunk_size=batch_size):
+            batch.append(DailyNutritionRollup(**totals))
+            if len(batch) >= batch_size:
+                DailyNutritionRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyNutritionRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -1,7 +1,56 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import DataEntry
+
+from .conf import get_setting
+from .models import DailyNutritionRollup, DataEntry
 
 class DataEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = DataEntry
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+        read_only_fields = ('timestamp',)
+
+class DailyNutritionRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyNutritionRollup
+        fields = ('date', 'entry_count', 'protein', 'carbs', 'fat', 'vitamins', 'minerals')
+
+
+class DataEntryItemSerializer(serializers.ModelSerializer):
+    """
+    One entry of a bulk submission, owned by the requesting user
+
+    timestamp is when the entry was logged on the device, the time of the
+    sync if omitted.
+    """
+    # Tolerated difference between the device clock and the server's
+    MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+    class Meta:
+        model = DataEntry
+        fields = ('timestamp', 'protein', 'carbs', 'fat', 'vitamins', 'minerals', 'idempotency_key')
+        extra_kwargs = {'timestamp': {'required': False}}
+
+    def validate_timestamp(self, value):
+        if value > timezone.now() + self.MAX_CLOCK_SKEW:
+            raise serializers.ValidationError("Cannot be in the future.")
+        return value
+
+    def validate_idempotency_key(self, value):
+        return value or None
+
+
+class BulkDataEntrySerializer(serializers.Serializer):
+    """
+    Entries logged while offline; each item is validated on its own by
+    submit_entries(), so one bad item does not reject the rest
+    """
+    entries = serializers.ListField(allow_empty=False)
+
+    def validate_entries(self, entries):
+        max_items = get_setting('BULK_SUBMIT_MAX_ITEMS')
+        if len(entries) > max_items:
+            raise serializers.ValidationError(f"At most {max_items} entries per request.")
+        return entries
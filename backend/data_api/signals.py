@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .dashboard import invalidate_dashboard
+from .models import DataEntry
+from .rollups import apply_entries, entry_date, rebuild_day
+
+
+def rollup_key(instance):
+    """(user id, day) the entry is counted under, None if not loaded"""
+    if 'user_id' not in instance.__dict__ or instance.__dict__.get('timestamp') is None:
+        return None
+    return instance.user_id, entry_date(instance)
+
+
+@receiver(post_init, sender=DataEntry)
+def remember_rollup_day(sender, instance, **kwargs):
+    instance._rollup_key = rollup_key(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=DataEntry)
+def add_to_rollup(sender, instance, created, **kwargs):
+    if created:
+        apply_entries([instance])
+    else:
+        # The previous values are unknown, so recount the whole day, and the
+        # day the entry was counted under before if its timestamp moved
+        current = (instance.user_id, entry_date(instance))
+        for user_id, date in {current, instance._rollup_key} - {None}:
+            rebuild_day(user_id, date)
+    instance._rollup_key = (instance.user_id, entry_date(instance))
+
+
+@receiver(post_delete, sender=DataEntry)
+def remove_from_rollup(sender, instance, **kwargs):
+    apply_entries([instance], sign=-1)
+
+
+@receiver(post_save, sender=DataEntry)
+@receiver(post_delete, sender=DataEntry)
+def expire_dashboard(sender, instance, **kwargs):
+    # After commit, so a dashboard built meanwhile cannot miss the change
+    transaction.on_commit(lambda: invalidate_dashboard(instance.user_id))
@@ -1,3 +1,285 @@
+import importlib
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import bulk
+from .models import DailyNutritionRollup, DataEntry
+from .rollups import day_start
+
+# A year of logs per user; raise DASHBOARD_BENCH_USERS (e.g. to 2000) to
+# benchmark against a production-sized table
+BENCH_USERS = int(os.environ.get('DASHBOARD_BENCH_USERS', 40))
+BENCH_DAYS = 365
+BENCH_ENTRIES_PER_DAY = 3
+
+
+def seed_entries(users, days, per_day, batch_size=5000):
+    now = timezone.now()
+    rng = random.Random(0)
+    batch = []
+    for user in users:
+        for day in range(days):
+            for meal in range(per_day):
+                batch.append(DataEntry(
+                    user=user,
+                    timestamp=now - timedelta(days=day, hours=meal * 5),
+                    protein=Decimal(rng.randint(0, 60000)) / 1000,
+                    carbs=Decimal(rng.randint(0, 120000)) / 1000,
+                    fat=Decimal(rng.randint(0, 40000)) / 1000,
+                    vitamins=Decimal(rng.randint(0, 1000)) / 1000,
+                    minerals=Decimal(rng.randint(0, 1000)) / 1000,
+                ))
+                if len(batch) >= batch_size:
+                    DataEntry.objects.bulk_create(batch)
+                    batch = []
+    DataEntry.objects.bulk_create(batch)
+
+
+class RollupTests(TestCase):
+    """Daily rollups must always equal the sums of the entries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='logger')
+        cls.today = timezone.localdate()
+        cls.yesterday = cls.today - timedelta(days=1)
+
+    def log(self, date, protein):
+        return DataEntry.objects.create(
+            user=self.user, timestamp=day_start(date) + timedelta(hours=12),
+            protein=protein, carbs=0, fat=0, vitamins=0, minerals=0,
+        )
+
+    def rollups(self):
+        return {
+            rollup.date: (rollup.entry_count, rollup.protein)
+            for rollup in DailyNutritionRollup.objects.filter(user=self.user)
+        }
+
+    def test_create_and_delete(self):
+        first = self.log(self.today, 10)
+        self.log(self.today, 5)
+        self.assertEqual(self.rollups(), {self.today: (2, Decimal('15.000'))})
+        first.delete()
+        self.assertEqual(self.rollups(), {self.today: (1, Decimal('5.000'))})
+        DataEntry.objects.get().delete()
+        self.assertEqual(self.rollups(), {})
+
+    def test_moving_an_entry_to_another_day(self):
+        self.log(self.today, 5)
+        # Loaded again, as an edit through the API would
+        entry = DataEntry.objects.get(pk=self.log(self.today, 10).pk)
+        entry.timestamp = day_start(self.yesterday) + timedelta(hours=8)
+        entry.protein = 12
+        entry.save()
+        self.assertEqual(self.rollups(), {
+            self.yesterday: (1, Decimal('12.000')),
+            self.today: (1, Decimal('5.000')),
+        })
+        entry.delete()
+        self.assertEqual(self.rollups(), {self.today: (1, Decimal('5.000'))})
+
+    def test_migration_backfills_existing_entries(self):
+        self.log(self.today, 5)
+        self.log(self.yesterday, 7)
+        # As before the rollups existed
+        DailyNutritionRollup.objects.all().delete()
+        migration = importlib.import_module('data_api.migrations.0006_backfill_daily_rollups')
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(self.rollups(), {
+            self.yesterday: (1, Decimal('7.000')),
+            self.today: (1, Decimal('5.000')),
+        })
+
+
+class DashboardTests(TestCase):
+    """GET /dashboard/ must stay fast however long the users' histories are"""
+
+    SAMPLES = 50
+    MAX_P95_SECONDS = 0.1
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=f'bench{i}') for i in range(BENCH_USERS)])
+        cls.users = list(User.objects.filter(username__startswith='bench'))
+        seed_entries(cls.users, BENCH_DAYS, BENCH_ENTRIES_PER_DAY)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_dashboard(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_uncached_p95_latency(self):
+        durations = []
+        for user in random.Random(1).choices(self.users, k=self.SAMPLES):
+            cache.clear()
+            started = time.perf_counter()
+            self.get_dashboard(user)
+            durations.append(time.perf_counter() - started)
+        p95 = statistics.quantiles(durations, n=20)[-1]
+        self.assertLess(p95, self.MAX_P95_SECONDS)
+
+    def test_summaries_match_entries(self):
+        user = self.users[0]
+        dashboard = self.get_dashboard(user)
+        today = timezone.localdate()
+        todays = [
+            entry for entry in DataEntry.objects.filter(user=user)
+            if timezone.localdate(entry.timestamp) == today
+        ]
+        daily = dashboard['daily_summary']
+        self.assertEqual(daily['entry_count'], len(todays))
+        self.assertAlmostEqual(daily['protein'], float(sum(entry.protein for entry in todays)), places=3)
+        self.assertAlmostEqual(
+            daily['total_calories'],
+            float(sum(4 * (entry.protein + entry.carbs) + 9 * entry.fat for entry in todays)),
+            places=0,
+        )
+        self.assertEqual(len(dashboard['weekly_summary']['days']), 7)
+        self.assertEqual(dashboard['monthly_summary']['days_logged'], today.day)
+
+    def test_submission_invalidates_cache(self):
+        user = self.users[0]
+        before = self.get_dashboard(user)['daily_summary']['entry_count']
+        with self.captureOnCommitCallbacks(execute=True):
+            DataEntry.objects.create(user=user, protein=1, carbs=1, fat=1, vitamins=0, minerals=0)
+        self.assertEqual(self.get_dashboard(user)['daily_summary']['entry_count'], before + 1)
+
+
+class DataEntryListTests(TestCase):
+    """The range query reads one page of the user's own rows per request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, other = User.objects.bulk_create([User(username='owner'), User(username='other')])
+        seed_entries([cls.user, other], days=30, per_day=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.localdate()
+        self.params = {'start_date': str(today - timedelta(days=20)), 'end_date': str(today), 'page_size': 25}
+
+    def test_one_query_per_page(self):
+        seen = []
+        url, params = '/data/list/', self.params
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen.extend(page['results'])
+            url, params = page['next'], None
+
+        expected = DataEntry.objects.filter(
+            user=self.user, timestamp__gte=day_start(timezone.localdate() - timedelta(days=20)),
+        ).order_by('timestamp', 'id')
+        self.assertEqual([row['id'] for row in seen], list(expected.values_list('id', flat=True)))
+        self.assertEqual({row['user'] for row in seen}, {self.user.id})
+
+    @skipUnless(connection.vendor == 'sqlite', 'query plan format is backend specific')
+    def test_range_scan_uses_composite_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/data/list/', self.params)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('dataentry_user_timestamp', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class BulkSubmitTests(TestCase):
+    """Offline logs are stored once, on the day they were logged"""
+
+    ENTRY = {'protein': '10', 'carbs': '20', 'fat': '5', 'vitamins': '0.1', 'minerals': '0.2'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='offline')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, entries):
+        return self.client.post('/data/submit/bulk/', {'entries': entries}, format='json')
+
+    def test_client_timestamps_are_kept(self):
+        logged_at = timezone.now() - timedelta(days=1)
+        response = self.submit([{**self.ENTRY, 'timestamp': logged_at.isoformat()}, self.ENTRY])
+        self.assertEqual(response.status_code, 201)
+        first, second = response.json()['results']
+        self.assertEqual(DataEntry.objects.get(pk=first['id']).timestamp, logged_at)
+        self.assertGreater(DataEntry.objects.get(pk=second['id']).timestamp, logged_at)
+        self.assertEqual(
+            sorted(self.user.daily_rollups.values_list('date', flat=True)),
+            sorted({timezone.localdate(logged_at), timezone.localdate()}),
+        )
+
+    def test_future_timestamp_is_invalid(self):
+        later = timezone.now() + timedelta(hours=1)
+        response = self.submit([{**self.ENTRY, 'timestamp': later.isoformat()}])
+        self.assertEqual(response.json()['results'][0]['status'], 'invalid')
+        self.assertFalse(DataEntry.objects.exists())
+
+    def test_retry_is_not_counted_twice(self):
+        entries = [{**self.ENTRY, 'idempotency_key': 'meal-1'}, {**self.ENTRY, 'idempotency_key': 'meal-2'}]
+        first = self.submit(entries).json()
+        retry = self.submit(entries)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual([item['status'] for item in retry.json()['results']], ['duplicate', 'duplicate'])
+        self.assertEqual(
+            [item['id'] for item in retry.json()['results']],
+            [item['id'] for item in first['results']],
+        )
+        self.assertEqual(DataEntry.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.user.daily_rollups.get().entry_count, 2)
+
+    def test_key_repeated_within_batch(self):
+        response = self.submit([
+            {**self.ENTRY, 'idempotency_key': 'meal-1'},
+            {**self.ENTRY, 'idempotency_key': 'meal-1'},
+            {'protein': 'lots'},
+        ])
+        body = response.json()
+        self.assertEqual((body['created'], body['duplicate'], body['invalid']), (1, 1, 1))
+        self.assertEqual(body['results'][1]['id'], body['results'][0]['id'])
+        self.assertEqual(DataEntry.objects.count(), 1)
+
+    def test_concurrent_insert_of_same_key(self):
+        # Another request stored the key after the lookup: the first lookup
+        # misses it, the insert hits the unique constraint and is retried
+        stored = DataEntry.objects.create(user=self.user, idempotency_key='meal-1', **self.ENTRY)
+        real_existing_keys = bulk.existing_keys
+        calls = []
+
+        def stale_lookup(user, keys):
+            calls.append(keys)
+            return {} if len(calls) == 1 else real_existing_keys(user, keys)
 
-# Create your tests here.
+        with mock.patch.object(bulk, 'existing_keys', side_effect=stale_lookup):
+            response = self.submit([{**self.ENTRY, 'idempotency_key': 'meal-1'}, self.ENTRY])
+        self.assertEqual(len(calls), 2)
+        results = response.json()['results']
+        self.assertEqual([item['status'] for item in results], ['duplicate', 'created'])
+        self.assertEqual(results[0]['id'], stored.id)
+        self.assertEqual(DataEntry.objects.count(), 2)
@@ -1,8 +1,11 @@
 
 from django.urls import path
-from .views import DataEntryCreateView, DataEntryListByDateView
+from .views import BulkDataEntryCreateView, DailyNutritionRollupView, DataEntryCreateView, DataEntryListByDateView, HistoryExportView
 
 urlpatterns = [
     path('submit/', DataEntryCreateView.as_view(), name='data-submit'),
+    path('submit/bulk/', BulkDataEntryCreateView.as_view(), name='data-submit-bulk'),
     path('list/', DataEntryListByDateView.as_view(), name='data-list'),
+    path('rollups/', DailyNutritionRollupView.as_view(), name='data-rollups'),
+    path('export/<str:kind>.<str:file_format>', HistoryExportView.as_view(), name='data-export'),
 ]
\ No newline at end of file
@@ -2,11 +2,17 @@
 
 from rest_framework import status, generics
 from rest_framework.response import Response
-from .models import DataEntry
-from .serializers import DataEntrySerializer
-from django.utils.dateparse import parse_datetime
+from rest_framework.views import APIView
+from .bulk import submit_entries
+from .dashboard import get_dashboard
+from .export import EXPORTS, FORMATS, render_export
+from .models import DailyNutritionRollup, DataEntry
+from .pagination import DataEntryCursorPagination
+from .serializers import BulkDataEntrySerializer, DailyNutritionRollupSerializer, DataEntrySerializer
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils import timezone
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
+from django.http import StreamingHttpResponse
 
 class DataEntryCreateView(generics.CreateAPIView):
 
@@ -20,28 +26,126 @@ class DataEntryCreateView(generics.CreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+class BulkDataEntryCreateView(generics.GenericAPIView):
+    """
+    API endpoint storing a batch of entries for the requesting user, e.g.
+    everything logged while the app was offline
+
+    Each item may carry the timestamp it was logged at on the device. Items
+    carrying an idempotency_key that was already stored are not counted
+    again, so a failed sync can simply be retried. The response
+    reports the outcome of every item.
+    """
+    serializer_class = BulkDataEntrySerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = submit_entries(request.user, serializer.validated_data['entries'])
+
+        counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return Response(
+            {**counts, 'results': results},
+            status=status.HTTP_201_CREATED if counts['created'] else status.HTTP_200_OK,
+        )
+
+def parse_date_range(query_params):
+    """
+    Read the start_date and end_date query parameters
+
+    Both accept YYYY-MM-DD or YYYY-MM-DDThh:mm:ss; a plain end date
+    covers that whole day.
+
+    Returns:
+        Tuple of aware (start, end) datetimes, both inclusive
+    """
+    start_date = query_params.get('start_date')
+    end_date = query_params.get('end_date')
+
+    if not start_date or not end_date:
+        raise ValidationError("Both start_date and end_date are required query parameters")
+
+    try:
+        start_datetime = parse_datetime(start_date)
+        end_datetime = parse_datetime(end_date)
+
+        # parse_datetime() also reads plain dates, as midnight, so those are
+        # checked first for the end date to cover its whole day
+        if parse_date(start_date):
+            start_datetime = timezone.make_aware(timezone.datetime.strptime(start_date, "%Y-%m-%d"))
+        if parse_date(end_date):
+            end_datetime = timezone.make_aware(timezone.datetime.strptime(end_date, "%Y-%m-%d"))
+            end_datetime = end_datetime.replace(hour=23, minute=59, second=59, microsecond=999999)
+        if not start_datetime or not end_datetime:
+            raise ValueError
+
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid date format. Use YYYY-MM-DD or YYYY-MM-DDThh:mm:ss format")
+
+    if timezone.is_naive(start_datetime):
+        start_datetime = timezone.make_aware(start_datetime)
+    if timezone.is_naive(end_datetime):
+        end_datetime = timezone.make_aware(end_datetime)
+    return start_datetime, end_datetime
+
 class DataEntryListByDateView(generics.ListAPIView):
+    """
+    API endpoint for the requesting user's entries in a date range
 
+    Paginated with a cursor, follow the next link for further pages.
+    """
     serializer_class = DataEntrySerializer
-    
+    pagination_class = DataEntryCursorPagination
+
+    def get_queryset(self):
+        start_datetime, end_datetime = parse_date_range(self.request.query_params)
+        return DataEntry.objects.filter(
+            user=self.request.user, timestamp__gte=start_datetime, timestamp__lte=end_datetime,
+        )
+
+class DailyNutritionRollupView(generics.ListAPIView):
+    """
+    API endpoint for the requesting user's daily nutrition totals
+
+    Reads only the pre-aggregated rollups, one row per day that has entries,
+    so a range costs as many rows as it has days. Days without entries are
+    left out.
+    """
+    serializer_class = DailyNutritionRollupSerializer
+
     def get_queryset(self):
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        
-        if not start_date or not end_date:
-            raise ValidationError("Both start_date and end_date are required query parameters")
-
-        try:
-            start_datetime = parse_datetime(start_date)
-            end_datetime = parse_datetime(end_date)
-            
-            if not start_datetime:
-                start_datetime = timezone.make_aware(timezone.datetime.strptime(start_date, "%Y-%m-%d"))
-            if not end_datetime:
-                end_datetime = timezone.make_aware(timezone.datetime.strptime(end_date, "%Y-%m-%d"))
-                end_datetime = end_datetime.replace(hour=23, minute=59, second=59)
-        
-        except (ValueError, TypeError):
-            raise ValidationError("Invalid date format. Use YYYY-MM-DD or YYYY-MM-DDThh:mm:ss format")
-        
-        return DataEntry.objects.filter(timestamp__gte=start_datetime, timestamp__lte=end_datetime)
\ No newline at end of file
+        start_datetime, end_datetime = parse_date_range(self.request.query_params)
+        return DailyNutritionRollup.objects.filter(
+            user=self.request.user,
+            date__gte=timezone.localdate(start_datetime),
+            date__lte=timezone.localdate(end_datetime),
+        )
+
+class DashboardView(APIView):
+    """
+    API endpoint for the requesting user's daily, weekly and monthly summaries
+
+    Aggregated by the database and cached per user until their next
+    submission (see dashboard.py).
+    """
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_dashboard(request.user.id))
+
+class HistoryExportView(APIView):
+    """
+    API endpoint streaming the requesting user's whole history of entries
+    or image uploads, e.g. data/export/entries.csv or images.ndjson
+    """
+
+    def get(self, request, kind, file_format, *args, **kwargs):
+        if kind not in EXPORTS or file_format not in FORMATS:
+            raise NotFound(f"Export {kind}.{file_format} is not available.")
+        response = StreamingHttpResponse(
+            render_export(kind, file_format, users=[request.user.id]),
+            content_type=FORMATS[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{file_format}"'
+        return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ImageUpload, PredictionFeedback
+from .models import Dish, ImageUpload, PredictionFeedback
 
 @admin.register(ImageUpload)
 class ImageUploadAdmin(admin.ModelAdmin):
@@ -13,4 +13,10 @@ class PredictionFeedbackAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'timestamp')
     list_filter = ('user',)
     search_fields = ('id', 'user__username',)
-    readonly_fields = ('timestamp',)
\ No newline at end of file
+    readonly_fields = ('timestamp',)
+
+@admin.register(Dish)
+class DishAdmin(admin.ModelAdmin):
+    list_display = ('name', 'calories_kcal', 'protein_g', 'carbohydrates_g', 'fats_g', 'updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,215 @@
+import ast
+import logging
+import random
+import shutil
+from pathlib import Path
+
+from .lazy import cv2, np
+
+logger = logging.getLogger(__name__)
+
+BACKEND_PYTORCH = 'pytorch'
+BACKEND_ONNX = 'onnx'
+BACKEND_OPENVINO = 'openvino'
+BACKENDS = (BACKEND_PYTORCH, BACKEND_ONNX, BACKEND_OPENVINO)
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def weights_path(source_path, backend, int8=False):
+    """
+    Path of the weights a backend serves, derived from the PyTorch checkpoint
+
+    Args:
+        source_path: Path to the trained .pt checkpoint
+        backend: One of BACKENDS
+        int8: Whether the INT8 quantized export is wanted
+
+    Returns:
+        Path to the .pt file, .onnx file or OpenVINO model directory
+    """
+    source_path = Path(source_path)
+    if backend == BACKEND_PYTORCH:
+        if int8:
+            raise ValueError("INT8 quantization needs the onnx or openvino backend")
+        return source_path
+    suffix = '_int8' if int8 else ''
+    if backend == BACKEND_ONNX:
+        return source_path.with_name(f"{source_path.stem}{suffix}.onnx")
+    if backend == BACKEND_OPENVINO:
+        return source_path.with_name(f"{source_path.stem}{suffix}_openvino_model")
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+
+def exported_imgsz(path):
+    """
+    Read the input size stored in the metadata of an exported model
+
+    ultralytics only applies the training size automatically for .pt
+    checkpoints; dynamic ONNX/OpenVINO exports would otherwise be run at the
+    640px default and disagree with the PyTorch model.
+
+    Args:
+        path: Path to an .onnx file or OpenVINO model directory
+
+    Returns:
+        Input size as stored at export time, or None if it is not known
+    """
+    path = Path(path)
+    imgsz = None
+    if path.suffix == '.onnx':
+        import onnx
+        metadata = {prop.key: prop.value for prop in onnx.load(str(path), load_external_data=False).metadata_props}
+        imgsz = metadata.get('imgsz')
+    elif path.is_dir() and (path / 'metadata.yaml').exists():
+        import yaml
+        with open(path / 'metadata.yaml') as f:
+            imgsz = (yaml.safe_load(f) or {}).get('imgsz')
+    if isinstance(imgsz, str):
+        imgsz = ast.literal_eval(imgsz)
+    return imgsz
+
+
+def find_images(directory, limit=None, seed=0):
+    """
+    Collect image files below a directory, sampled reproducibly
+
+    Args:
+        directory: Root directory to search recursively
+        limit: Maximum number of images to return
+        seed: Seed for the random sample
+
+    Returns:
+        List of image paths
+    """
+    images = sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    if limit is not None and len(images) > limit:
+        images = sorted(random.Random(seed).sample(images, limit))
+    return images
+
+
+def classify_input(image, imgsz):
+    """
+    Reproduce the ultralytics classification preprocessing
+
+    Resize the short side to imgsz, centre crop to imgsz x imgsz, convert
+    BGR to RGB and scale to [0, 1] in NCHW layout.
+
+    Args:
+        image: Decoded BGR image (numpy array)
+        imgsz: Model input size
+
+    Returns:
+        float32 array of shape (1, 3, imgsz, imgsz)
+    """
+    height, width = image.shape[:2]
+    scale = imgsz / min(height, width)
+    resized = cv2.resize(
+        image,
+        (max(imgsz, round(width * scale)), max(imgsz, round(height * scale))),
+        interpolation=cv2.INTER_LINEAR,
+    )
+    top = (resized.shape[0] - imgsz) // 2
+    left = (resized.shape[1] - imgsz) // 2
+    crop = resized[top:top + imgsz, left:left + imgsz, ::-1]
+    return np.ascontiguousarray(crop.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def quantize_onnx(fp32_path, int8_path, calibration_images, imgsz):
+    """
+    Post-training static INT8 quantization of an exported ONNX classifier
+
+    Args:
+        fp32_path: Path to the float ONNX model
+        int8_path: Where to write the quantized model
+        calibration_images: Image paths used to calibrate activation ranges
+        imgsz: Model input size
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = onnx.load(str(fp32_path), load_external_data=False).graph.input[0].name
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self, paths):
+            self._paths = iter(paths)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(str(path))
+                if image is not None:
+                    return {input_name: classify_input(image, imgsz)}
+            return None
+
+    quantize_static(
+        str(fp32_path),
+        str(int8_path),
+        ImageReader(calibration_images),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    # ultralytics reads class names, task and imgsz from the model metadata
+    source = onnx.load(str(fp32_path))
+    quantized = onnx.load(str(int8_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, str(int8_path))
+
+
+def export_model(source_path, backend, int8=False, calibration_dir=None,
+                 calibration_samples=200, imgsz=None, max_batch_size=8):
+    """
+    Convert the PyTorch checkpoint into an optimized CPU runtime format
+
+    Args:
+        source_path: Path to the trained .pt checkpoint
+        backend: BACKEND_ONNX or BACKEND_OPENVINO
+        int8: Apply post-training INT8 quantization
+        calibration_dir: Images used for INT8 calibration (a dataset root
+            with class folders for OpenVINO)
+        calibration_samples: Number of calibration images to use
+        imgsz: Input size, defaults to the size the model was trained with
+        max_batch_size: Largest batch the exported model must accept
+
+    Returns:
+        Path to the exported weights
+    """
+    from ultralytics import YOLO
+
+    if backend not in (BACKEND_ONNX, BACKEND_OPENVINO):
+        raise ValueError("Only the onnx and openvino backends can be exported")
+    if int8 and not calibration_dir:
+        raise ValueError("INT8 quantization needs a calibration image directory")
+
+    model = YOLO(str(source_path))
+    imgsz = imgsz or model.model.args.get('imgsz', 224)
+    target = weights_path(source_path, backend, int8)
+
+    if backend == BACKEND_OPENVINO:
+        # ultralytics runs NNCF post-training quantization when int8 is set
+        exported = model.export(
+            format='openvino', imgsz=imgsz, dynamic=True, batch=max_batch_size,
+            int8=int8, data=str(calibration_dir) if int8 else None,
+        )
+        exported = Path(exported)
+        if exported != target:
+            if target.exists():
+                shutil.rmtree(target)
+            shutil.move(str(exported), str(target))
+        return target
+
+    fp32_path = Path(model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True))
+    if not int8:
+        if fp32_path != target:
+            shutil.move(str(fp32_path), str(target))
+        return target
+
+    images = find_images(calibration_dir, limit=calibration_samples)
+    if not images:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+    logger.info("Calibrating INT8 quantization on %d images", len(images))
+    quantize_onnx(fp32_path, target, images, imgsz)
+    return target
@@ -0,0 +1,109 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingInferenceEngine:
+    """
+    Collects concurrent inference requests into batches
+
+    Callers submit single images from their own threads. A background worker
+    takes the first waiting image, keeps collecting until either
+    max_batch_size images are queued or max_wait_ms has passed, runs one
+    batched forward pass and hands each result back to its caller.
+    """
+
+    def __init__(self, model_path, max_batch_size=8, max_wait_ms=5, model_registry=registry):
+        self.model_path = model_path
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.model_registry = model_registry
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self.batches_run = 0
+        self.images_processed = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so a worker started in a preloading
+        # master process has to be restarted in each child.
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, image):
+        """
+        Queue an image for inference
+
+        Args:
+            image: Input image (numpy array)
+
+        Returns:
+            Future resolving to the ultralytics Results object for the image
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((image, future))
+        return future
+
+    def predict(self, image, timeout=None):
+        """Run inference on one image and wait for its result"""
+        return self.submit(image).result(timeout=timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                with self.model_registry.use_model(self.model_path) as model:
+                    results = model.predict([image for image, _ in batch], verbose=False)
+            except Exception as exc:
+                logger.exception("Batched inference failed for %d images", len(batch))
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            self.batches_run += 1
+            self.images_processed += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches_run": self.batches_run,
+            "images_processed": self.images_processed,
+            "queued": self._queue.qsize(),
+        }
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import time
+import uuid
+
+from django.core.cache import caches
+from django.db import DatabaseError, connection
+
+from .conf import get_setting
+from .nutrition import NutritionTable, read_csv
+
+logger = logging.getLogger(__name__)
+
+
+def _cache():
+    return caches[get_setting('DISH_CATALOG_CACHE')]
+
+
+def _key(name):
+    # Scoped to the database the catalog is read from, so e.g. the test
+    # database never shares entries with the development one
+    database = hashlib.blake2b(str(connection.settings_dict['NAME']).encode(), digest_size=8).hexdigest()
+    return f'image_api:dish_catalog:{database}:{name}'
+
+
+def get_catalog_version():
+    """
+    Current version token of the dish catalog
+
+    The token lives in the shared cache, so every worker sees a new version
+    as soon as one of them bumps it. If it was evicted a fresh one is
+    created, which just makes every worker reload once.
+    """
+    cache = _cache()
+    version = cache.get(_key('version'))
+    if version is None:
+        cache.add(_key('version'), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_key('version'))
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached copy of the dish catalog"""
+    _cache().set(_key('version'), uuid.uuid4().hex, timeout=None)
+    # Let this process notice straight away instead of after the check interval
+    from .nutrition import _tables
+    for table in list(_tables.values()):
+        if isinstance(table, DishCatalogTable):
+            table.expire()
+
+
+def load_catalog(version):
+    """
+    Every dish of the catalog, read through the shared cache
+
+    Args:
+        version: Catalog version token the snapshot is cached under
+
+    Returns:
+        Tuple of (columns, names, rows) as read from the Dish table
+    """
+    from .models import Dish
+
+    cache = _cache()
+    key = _key(f'rows:{version}')
+    snapshot = cache.get(key)
+    if snapshot is None:
+        columns = tuple(Dish.NUTRIENT_FIELDS)
+        fields = list(Dish.NUTRIENT_FIELDS.values())
+        names, rows = [], []
+        for name, *values in Dish.objects.order_by('name').values_list('name', *fields).iterator(chunk_size=2000):
+            names.append(name)
+            rows.append(values)
+        snapshot = (columns, names, rows)
+        cache.set(key, snapshot, timeout=None)
+    return snapshot
+
+
+class DishCatalogTable(NutritionTable):
+    """
+    Nutrition table backed by the Dish model
+
+    The shared catalog version is checked at most every
+    DISH_CATALOG_CHECK_SECONDS; when it changed, the table is rebuilt from
+    the snapshot cached under the new version, so only the first worker to
+    notice queries the database. While the catalog is empty (or not
+    migrated yet) the bundled CSV is served instead.
+    """
+
+    def __init__(self, fallback_csv_path):
+        super().__init__(fallback_csv_path)
+        self._checked_at = None
+
+    def expire(self):
+        """Check the catalog version on the next access"""
+        self._checked_at = None
+
+    def _source_signature(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < get_setting('DISH_CATALOG_CHECK_SECONDS'):
+            return self._signature
+        try:
+            version = get_catalog_version()
+        except Exception:
+            logger.exception("Could not read the dish catalog version, keeping the loaded table")
+            return self._signature if self._signature is not None else (None, super()._source_signature())
+        self._checked_at = now
+        return (version, super()._source_signature())
+
+    def _load(self, signature):
+        version = signature[0]
+        try:
+            columns, names, rows = load_catalog(version) if version is not None else ((), [], [])
+        except DatabaseError:
+            logger.exception("Could not read the dish catalog, using %s", self.csv_path)
+            columns, names, rows = (), [], []
+        if not names:
+            columns, names, rows = read_csv(self.csv_path)
+        self._build(columns, names, rows)
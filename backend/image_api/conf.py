@@ -0,0 +1,73 @@
+from django.conf import settings
+
+# Defaults for the IMAGE_API settings dictionary, override any of them in
+# backend/settings.py
+DEFAULTS = {
+    # Micro-batching of concurrent inference requests
+    'BATCHING_ENABLED': True,
+    'BATCH_MAX_SIZE': 8,
+    'BATCH_MAX_WAIT_MS': 5,
+    # Return 202 from uploads and predict in a local worker pool. Queued
+    # uploads are held in memory, past ASYNC_QUEUE_SIZE of them uploads are
+    # answered with 503 (see the resume_predictions command for restarts)
+    'ASYNC_UPLOADS': False,
+    'ASYNC_WORKERS': 4,
+    'ASYNC_QUEUE_SIZE': 64,
+    # Reuse predictions for repeated images ('exact' or 'perceptual' keys)
+    'PREDICTION_CACHE_ENABLED': True,
+    'PREDICTION_CACHE_SIZE': 1024,
+    'PREDICTION_CACHE_MODE': 'exact',
+    'PREDICTION_CACHE_MAX_DISTANCE': 4,
+    # 'pytorch', 'onnx' or 'openvino'; INT8 needs an exported quantized model
+    'INFERENCE_BACKEND': 'pytorch',
+    'INFERENCE_INT8': False,
+    # Most classes an upload may ask for with top_k
+    'PREDICTION_TOP_K_MAX': 5,
+    # Also report nutrition averaged over the top PREDICTION_TOP_K_MAX
+    # classes weighted by probability; uploads can ask with expected=true
+    'EXPECTED_NUTRITION': False,
+    # Named model versions (name -> weights path, relative to BASE_DIR), the
+    # share of traffic each receives and an optional shadow candidate run on
+    # a sample of uploads without affecting the response
+    'MODEL_VERSIONS': {},
+    'TRAFFIC_SPLIT': {},
+    'SHADOW_MODEL': None,
+    'SHADOW_SAMPLE_RATE': 0.0,
+    # Load and warm up the models when backend.wsgi/asgi is imported, i.e.
+    # before gunicorn forks its workers when preload_app is on
+    'PRELOAD_MODEL': True,
+    'WARMUP_ITERATIONS': 2,
+    # Most (dish_name, grams) items accepted by one bulk nutrition request
+    'BULK_NUTRITION_MAX_ITEMS': 1000,
+    # Serve nutrition from the Dish table ('database', falls back to the CSV
+    # while it is empty) or from nutrient_values.csv only ('csv'). Workers
+    # share the catalog through this cache alias and check its version at
+    # most every DISH_CATALOG_CHECK_SECONDS.
+    'NUTRITION_SOURCE': 'database',
+    'DISH_CATALOG_CACHE': 'default',
+    'DISH_CATALOG_CHECK_SECONDS': 1.0,
+    # Stored uploads are downscaled to INGEST_MAX_SIDE and re-encoded
+    # ('webp' or 'jpeg') by a pool of INGEST_WORKERS threads after the
+    # response, together with the thumbnails; the original is only kept if
+    # INGEST_KEEP_ORIGINAL. Uploads left over once INGEST_QUEUE_SIZE are
+    # waiting are done by the reencode_uploads command
+    'INGEST_ENABLED': True,
+    'INGEST_MAX_SIDE': 1600,
+    'INGEST_FORMAT': 'webp',
+    'INGEST_QUALITY': 80,
+    'INGEST_KEEP_ORIGINAL': False,
+    'INGEST_WORKERS': 2,
+    'INGEST_QUEUE_SIZE': 16,
+    # Thumbnail sizes (name -> longest side) listed next to every image.
+    # They are generated in the ingest pool after an upload if
+    # THUMBNAIL_EAGER, otherwise on first request
+    'THUMBNAIL_SIZES': {'small': 160, 'medium': 480},
+    'THUMBNAIL_FORMAT': 'webp',
+    'THUMBNAIL_QUALITY': 75,
+    'THUMBNAIL_EAGER': True,
+}
+
+
+def get_setting(name):
+    """Return an IMAGE_API setting, falling back to the default"""
+    return getattr(settings, 'IMAGE_API', {}).get(name, DEFAULTS[name])
@@ -0,0 +1,117 @@
+import bisect
+import re
+import threading
+
+from .nutrition import get_nutrition_table
+from .lazy import np
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase and drop separators, so 'Butter-Chicken' == 'butter_chicken' == 'butterchicken'"""
+    return _NON_ALNUM.sub('', text.lower())
+
+
+def trigrams(text):
+    """Set of character trigrams of a normalized string, padded at both ends"""
+    padded = f"^{text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DishSearchIndex:
+    """
+    Trigram index over dish names for typo-tolerant search
+
+    Every name is normalized and split into character trigrams. An inverted
+    index maps each trigram to the ids of the dishes containing it, so a
+    query only touches the postings of its own trigrams. Matches are ranked
+    by the Dice coefficient of the two trigram sets, with a bonus for names
+    that start with the query so autocomplete works from the first letters.
+    """
+
+    PREFIX_BONUS = 0.3
+
+    def __init__(self, names):
+        self.names = names if isinstance(names, tuple) else tuple(names)
+        self._normalized = [normalize(name) for name in self.names]
+        postings = {}
+        sizes = np.zeros(len(self.names), dtype=np.float32)
+        for dish_id, name in enumerate(self._normalized):
+            grams = trigrams(name)
+            sizes[dish_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(dish_id)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sizes = sizes
+        self._exact = {}
+        for dish_id, name in enumerate(self._normalized):
+            self._exact.setdefault(name, dish_id)
+        # Sorted names let prefix lookups use bisection instead of a scan
+        order = sorted(range(len(self.names)), key=lambda dish_id: self._normalized[dish_id])
+        self._sorted_names = [self._normalized[dish_id] for dish_id in order]
+        self._sorted_ids = np.array(order, dtype=np.int32)
+
+    def _prefix_ids(self, prefix):
+        start = bisect.bisect_left(self._sorted_names, prefix)
+        end = bisect.bisect_left(self._sorted_names, prefix + '\x7f')
+        return self._sorted_ids[start:end]
+
+    def search(self, query, limit=10, min_score=0.0):
+        """
+        Rank dish names against a free-text query
+
+        Args:
+            query: User input, in any case and with any separators
+            limit: Maximum number of matches
+            min_score: Drop matches scoring below this
+
+        Returns:
+            List of (dish_name, score) tuples, best first
+        """
+        normalized = normalize(query)
+        if not normalized or not self.names:
+            return []
+
+        grams = trigrams(normalized)
+        matched = [self._postings[gram] for gram in grams if gram in self._postings]
+        scores = np.zeros(len(self.names), dtype=np.float32)
+        if matched:
+            counts = np.bincount(np.concatenate(matched), minlength=len(self.names))
+            scores = 2.0 * counts / (len(grams) + self._sizes)
+
+        scores[self._prefix_ids(normalized)] += self.PREFIX_BONUS
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            scores[exact] = max(scores[exact], 1.0 + self.PREFIX_BONUS)
+
+        candidates = np.flatnonzero(scores > min_score)
+        if candidates.size > limit:
+            candidates = candidates[np.argpartition(scores[candidates], -limit)[-limit:]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [(self.names[dish_id], float(min(scores[dish_id], 1.0))) for dish_id in candidates]
+
+    def best_match(self, query, min_score=0.5):
+        """The single best dish name for a query, or None if nothing is close enough"""
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0][0] if matches else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dish_index():
+    """
+    Return the search index over the current nutrition table's dish names
+
+    The index is rebuilt whenever the nutrition table reloads with a
+    different set of names.
+    """
+    global _index
+    names = get_nutrition_table().snapshot().names
+    if _index is None or _index.names is not names:
+        with _index_lock:
+            if _index is None or _index.names is not names:
+                _index = DishSearchIndex(names)
+    return _index
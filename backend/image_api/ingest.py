@@ -0,0 +1,149 @@
+import io
+import logging
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+
+from .conf import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name, file extension and encoder options of each output
+# format. WebP's default effort (method=4) costs about twice the encode time
+# of method=3 for a few percent smaller files, too much on the upload path.
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'method': 3}),
+}
+
+
+class IngestedImage:
+    """The bytes to store for an upload, and what re-encoding saved"""
+
+    def __init__(self, data, extension, original_bytes, width, height):
+        self.data = data
+        self.extension = extension
+        self.original_bytes = original_bytes
+        self.width = width
+        self.height = height
+
+    @property
+    def stored_bytes(self):
+        return len(self.data)
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.stored_bytes
+
+
+def downscale(data, max_side, image_format='webp', quality=80):
+    """
+    Cap the resolution of an encoded image and re-encode it
+
+    EXIF orientation is applied to the pixels, so the result displays the
+    right way up without any metadata; the rest of the EXIF block (camera,
+    GPS position) is dropped. JPEG sources are decoded at a reduced DCT
+    scale where possible, which is much cheaper than a full decode.
+
+    Args:
+        data: Encoded image bytes
+        max_side: Longest side of the stored image in pixels
+        image_format: Output format, a key of FORMATS
+        quality: Encoder quality (1-100)
+
+    Returns:
+        IngestedImage; the original bytes are kept when re-encoding would
+        not make the file smaller and nothing had to be resized or rotated
+    """
+    from PIL import Image, ImageOps
+
+    pil_format, extension, options = FORMATS[image_format]
+    with Image.open(io.BytesIO(data)) as image:
+        source_format = (image.format or '').lower()
+        orientation = image.getexif().get(0x0112, 1)
+        needs_resize = max(image.size) > max_side
+        # draft() only shrinks by powers of two and never below the request
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        if image.mode not in ('RGB', 'RGBA') or (image.mode == 'RGBA' and pil_format == 'JPEG'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, pil_format, quality=quality, icc_profile=image.info.get('icc_profile'), **options)
+        width, height = image.size
+
+    encoded = output.getvalue()
+    if len(encoded) >= len(data) and not needs_resize and orientation == 1:
+        # Already small and well encoded, store it as it came
+        extension = 'jpg' if source_format == 'jpeg' else source_format or extension
+        return IngestedImage(data, extension, len(data), width, height)
+    return IngestedImage(encoded, extension, len(data), width, height)
+
+
+def upload_fields(data, filename):
+    """
+    Model field values for storing an upload as received
+
+    Writing the bytes is cheap, so this is all the request itself does;
+    the re-encode is left to reencode_upload() in the ingest pool.
+    """
+    return {
+        'image': ContentFile(data, name=filename),
+        'original_bytes': len(data),
+        'stored_bytes': len(data),
+        'ingested': not get_setting('INGEST_ENABLED'),
+    }
+
+
+def reencode_upload(upload, data):
+    """
+    Replace the stored image of an upload with its downscaled version
+
+    Applies the INGEST_* settings: the stored image is downscaled and
+    re-encoded, and the untouched upload stays referenced from
+    original_image only when INGEST_KEEP_ORIGINAL is set; otherwise its
+    blob is released (see signals.py). Runs in the ingest pool, as decoding
+    and encoding a phone photo takes around half a second.
+
+    Args:
+        upload: The ImageUpload, stored by upload_fields()
+        data: Encoded image bytes as uploaded
+
+    Returns:
+        True if the stored image was replaced
+    """
+    upload.ingested = True
+    if not get_setting('INGEST_ENABLED'):
+        upload.save(update_fields=['ingested'])
+        return False
+
+    try:
+        ingested = downscale(
+            data,
+            max_side=get_setting('INGEST_MAX_SIDE'),
+            image_format=get_setting('INGEST_FORMAT'),
+            quality=get_setting('INGEST_QUALITY'),
+        )
+    except Exception:
+        # The upload already passed ImageField validation, so keep it as is
+        logger.exception("Could not re-encode upload %s, keeping the original", upload.pk)
+        ingested = None
+    if ingested is None or ingested.data is data:
+        upload.save(update_fields=['ingested'])
+        return False
+
+    # The thumbnails are made again from the new image
+    upload.available_thumbnails = []
+    update_fields = ['image', 'stored_bytes', 'available_thumbnails', 'ingested']
+    if get_setting('INGEST_KEEP_ORIGINAL'):
+        upload.original_image = upload.image.name
+        update_fields.append('original_image')
+    stem = Path(upload.image.name).stem
+    # Assigned rather than saved, so the save below writes it and hands
+    # the contents on to the blob reference (see signals.py)
+    upload.image = ContentFile(ingested.data, name=f"{stem}.{ingested.extension}")
+    upload.stored_bytes = ingested.stored_bytes
+    upload.save(update_fields=update_fields)
+    logger.debug("Stored upload %s in %d bytes, %d saved", upload.pk, ingested.stored_bytes, ingested.bytes_saved)
+    return True
@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connections, transaction
+
+from .conf import get_setting
+from .models import ImageUpload
+from .prediction import predict_image_content
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pending_derivatives = set()
+_pending_lock = threading.Lock()
+
+# Worker count and queue length settings of each pool
+POOLS = {
+    'prediction': ('ASYNC_WORKERS', 'ASYNC_QUEUE_SIZE'),
+    # Re-encodes and thumbnails, kept apart so they never delay predictions
+    'ingest': ('INGEST_WORKERS', 'INGEST_QUEUE_SIZE'),
+}
+
+QUEUE_FULL_ERROR = "Too many uploads were waiting for prediction, upload the image again later."
+
+
+class JobPool:
+    """
+    A thread pool that turns jobs away once too many are waiting
+
+    Queued jobs hold their upload bytes, so the queue is bounded to keep
+    memory use in check under a burst of uploads.
+    """
+
+    def __init__(self, name, max_workers, max_queued):
+        self.limit = max_workers + max_queued
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'image-{name}')
+        self._jobs = 0
+        self._lock = threading.Lock()
+
+    def has_capacity(self):
+        return self._jobs < self.limit
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in the pool, returns False if the queue is full"""
+        with self._lock:
+            if self._jobs >= self.limit:
+                return False
+            self._jobs += 1
+        self._executor.submit(fn, *args).add_done_callback(self._finished)
+        return True
+
+    def _finished(self, future):
+        with self._lock:
+            self._jobs -= 1
+
+
+def get_pool(name):
+    """
+    Return this process' worker pool of the given name (see POOLS)
+
+    Threads are enough here: inference releases the GIL and concurrent jobs
+    are grouped into batches by the inference engine.
+    """
+    pool = _pools.get(name)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None or pool.pid != os.getpid():
+                workers_setting, queue_setting = POOLS[name]
+                pool = _pools[name] = JobPool(name, get_setting(workers_setting), get_setting(queue_setting))
+    return pool
+
+
+def accepting_predictions():
+    """Whether the prediction queue has room for another upload"""
+    return get_pool('prediction').has_capacity()
+
+
+def enqueue_prediction(upload_id, top_k=1, image_data=None, expected=None):
+    """
+    Schedule prediction for an upload once the current transaction commits
+
+    If the queue filled up in the meantime the upload is marked failed
+    rather than waiting with its bytes in memory.
+
+    Args:
+        upload_id: Primary key of the ImageUpload to process
+        top_k: Number of best classes to record
+        image_data: Encoded image bytes; read back from storage if omitted
+        expected: Also record probability-weighted nutrition
+    """
+    def submit():
+        if not get_pool('prediction').submit(run_prediction, upload_id, top_k, image_data, expected):
+            logger.warning("Prediction queue is full, upload %s failed", upload_id)
+            ImageUpload.objects.filter(pk=upload_id, status=ImageUpload.STATUS_PENDING).update(
+                status=ImageUpload.STATUS_FAILED, error=QUEUE_FULL_ERROR,
+            )
+
+    transaction.on_commit(submit)
+
+
+def enqueue_ingest(upload_id, image_data):
+    """
+    Re-encode the stored copy of an upload, then generate its thumbnails,
+    in the ingest pool once the current transaction commits
+
+    If the pool is full the upload keeps its original image until the
+    reencode_uploads command processes it.
+    """
+    def submit():
+        if not get_pool('ingest').submit(run_ingest, upload_id, image_data):
+            logger.warning("Ingest queue is full, upload %s keeps its original image", upload_id)
+
+    transaction.on_commit(submit)
+
+
+def run_ingest(upload_id, image_data):
+    from .ingest import reencode_upload
+
+    close_old_connections()
+    try:
+        try:
+            with transaction.atomic():
+                # Locked, so a row is never re-encoded twice at the same time
+                upload = ImageUpload.objects.select_for_update().filter(pk=upload_id, ingested=False).first()
+                if upload is None:
+                    return
+                reencode_upload(upload, image_data)
+        except Exception:
+            logger.exception("Re-encoding upload %s failed, keeping the original", upload_id)
+        if get_setting('THUMBNAIL_EAGER'):
+            image_name = ImageUpload.objects.filter(pk=upload_id).values_list('image', flat=True).first()
+            if image_name:
+                run_derivatives(image_name)
+    finally:
+        connections.close_all()
+
+
+def enqueue_derivatives(image_name):
+    """
+    Generate the thumbnails of a stored image in the ingest pool once the
+    current transaction commits
+
+    An image already waiting in this process is not queued again, as the
+    thumbnail endpoint asks for every request of a missing thumbnail.
+    """
+    def submit():
+        with _pending_lock:
+            if image_name in _pending_derivatives:
+                return
+            _pending_derivatives.add(image_name)
+        if not get_pool('ingest').submit(run_derivatives, image_name):
+            with _pending_lock:
+                _pending_derivatives.discard(image_name)
+
+    transaction.on_commit(submit)
+
+
+def run_derivatives(image_name):
+    from .thumbnails import make_derivatives
+
+    try:
+        make_derivatives(image_name)
+    except Exception:
+        # The thumbnail endpoint schedules them again on the next request
+        logger.exception("Generating thumbnails of %s failed", image_name)
+    finally:
+        with _pending_lock:
+            _pending_derivatives.discard(image_name)
+
+
+def run_prediction(upload_id, top_k=1, image_data=None, expected=None):
+    """
+    Run prediction for a stored upload and record the outcome on it
+
+    Args:
+        upload_id: Primary key of the ImageUpload to process
+        top_k: Number of best classes to record
+        image_data: Encoded image bytes; read back from storage if omitted
+        expected: Also record probability-weighted nutrition
+    """
+    close_old_connections()
+    try:
+        updated = ImageUpload.objects.filter(
+            pk=upload_id, status=ImageUpload.STATUS_PENDING,
+        ).update(status=ImageUpload.STATUS_PROCESSING)
+        if not updated:
+            return
+
+        try:
+            if image_data is None:
+                with ImageUpload.objects.get(pk=upload_id).image.open('rb') as f:
+                    image_data = f.read()
+            prediction_result = predict_image_content(image_data, top_k=top_k, expected=expected)
+        except Exception as exc:
+            logger.exception("Prediction failed for upload %s", upload_id)
+            ImageUpload.objects.filter(pk=upload_id).update(
+                status=ImageUpload.STATUS_FAILED, error=str(exc),
+            )
+            return
+
+        ImageUpload.objects.filter(pk=upload_id).update(
+            prediction=prediction_result['class'],
+            prediction_detail=prediction_result,
+            status=ImageUpload.STATUS_COMPLETED,
+        )
+    finally:
+        # Worker threads own their database connections, release them
+        connections.close_all()
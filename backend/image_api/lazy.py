@@ -0,0 +1,27 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access
+
+    Lets modules on the URLconf import path write `from .lazy import np`
+    and use np.zeros() as usual, without loading numpy (or OpenCV) until a
+    request actually needs it. Attributes are cached on the instance after
+    the first lookup, so later accesses cost a plain attribute read.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        value = getattr(importlib.import_module(self._name), attribute)
+        setattr(self, attribute, value)
+        return value
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+np = LazyModule('numpy')
+cv2 = LazyModule('cv2')
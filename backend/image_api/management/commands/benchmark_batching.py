@@ -0,0 +1,79 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from image_api.batching import BatchingInferenceEngine
+from image_api.model_registry import registry
+from image_api.prediction import get_model_path
+
+
+class Command(BaseCommand):
+    help = "Measure inference throughput against the micro-batching max batch size on CPU"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help='Path to model weights, defaults to the served model')
+        parser.add_argument('--batch-sizes', default='1,2,4,8,16', help='Comma separated max batch sizes')
+        parser.add_argument('--max-wait-ms', type=float, default=5, help='Max wait before a partial batch runs')
+        parser.add_argument('--requests', type=int, default=64, help='Images sent per batch size')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads')
+        parser.add_argument('--image-size', type=int, default=640, help='Side of the synthetic test image')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        options['model'] = options['model'] or str(get_model_path())
+        if not Path(options['model']).exists():
+            raise CommandError(f"Model weights not found: {options['model']}")
+
+        batch_sizes = [int(size) for size in options['batch_sizes'].split(',')]
+        rng = np.random.default_rng(0)
+        size = options['image_size']
+        image = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+        # Load and warm up once so the first batch size is not charged for it
+        model = registry.get_model(options['model'])
+        model.predict(image, verbose=False)
+
+        rows = []
+        for batch_size in batch_sizes:
+            engine = BatchingInferenceEngine(
+                options['model'],
+                max_batch_size=batch_size,
+                max_wait_ms=options['max_wait_ms'],
+            )
+            engine.predict(image)
+
+            latencies = []
+
+            def send(_):
+                started = time.perf_counter()
+                engine.predict(image)
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                list(pool.map(send, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+            stats = engine.stats()
+            rows.append({
+                'max_batch_size': batch_size,
+                'images_per_second': options['requests'] / elapsed,
+                'mean_batch_size': (stats['images_processed'] - 1) / max(stats['batches_run'] - 1, 1),
+                'p50_latency_ms': float(np.percentile(latencies, 50) * 1000),
+                'p95_latency_ms': float(np.percentile(latencies, 95) * 1000),
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        self.stdout.write(f"{'batch':>6} {'img/s':>9} {'mean batch':>11} {'p50 ms':>9} {'p95 ms':>9}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['max_batch_size']:>6} {row['images_per_second']:>9.1f} "
+                f"{row['mean_batch_size']:>11.2f} {row['p50_latency_ms']:>9.1f} {row['p95_latency_ms']:>9.1f}"
+            )
@@ -0,0 +1,191 @@
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from image_api.backends import find_images
+from image_api.model_registry import registry
+from image_api.models import ImageUpload
+from image_api.prediction import (
+    decode_image, get_model_path, get_nutrition_by_dish, rank_predictions,
+)
+
+STAGES = ('decode', 'preprocess', 'forward', 'postprocess', 'nutrition', 'db_write')
+DEFAULT_RESOLUTIONS = '640x480,1920x1080,4032x3024'
+MODELS_DIR = Path(settings.BASE_DIR).parent / 'ml_model' / 'models'
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_jpeg(width, height, seed=0):
+    """A noisy gradient, so the JPEG has realistic entropy and size"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    image = np.clip(gradient + rng.normal(0, 40, (height, width, 3)), 0, 255).astype(np.uint8)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark the upload -> prediction -> nutrition path per stage, model and image size"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='*',
+                            help='Weights to benchmark, defaults to the served model and ml_model/models/*/weights/best.pt')
+        parser.add_argument('--resolutions', default=DEFAULT_RESOLUTIONS,
+                            help='Comma separated WIDTHxHEIGHT synthetic images')
+        parser.add_argument('--samples', help='Directory of sample images to include')
+        parser.add_argument('--sample-limit', type=int, default=20, help='Sample images to use')
+        parser.add_argument('--iterations', type=int, default=20, help='Warm runs per image set')
+        parser.add_argument('--skip-db', action='store_true', help='Leave out the DB write stage')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def get_models(self, options):
+        if options['models']:
+            models = [Path(path) for path in options['models']]
+        else:
+            models = [Path(get_model_path())] + sorted(MODELS_DIR.glob('*/weights/best.pt'))
+        models = [path for path in dict.fromkeys(path.resolve() for path in models) if path.exists()]
+        if not models:
+            raise CommandError("No model weights found to benchmark")
+        return models
+
+    def get_inputs(self, options):
+        inputs = {}
+        for resolution in options['resolutions'].split(','):
+            width, height = (int(value) for value in resolution.lower().split('x'))
+            inputs[f'synthetic_{width}x{height}'] = [synthetic_jpeg(width, height)]
+        if options['samples']:
+            paths = find_images(options['samples'], limit=options['sample_limit'])
+            if paths:
+                inputs['samples'] = [path.read_bytes() for path in paths]
+        return inputs
+
+    def run_once(self, model, data, imgsz, user):
+        timings = {}
+
+        started = time.perf_counter()
+        image = decode_image(data, target_size=imgsz)
+        timings['decode'] = time.perf_counter() - started
+
+        result = model.predict(image, verbose=False)[0]
+        # ultralytics reports its own stage timings in milliseconds
+        timings['preprocess'] = result.speed['preprocess'] / 1000
+        timings['forward'] = result.speed['inference'] / 1000
+
+        started = time.perf_counter()
+        predictions = rank_predictions(result, 1)
+        timings['postprocess'] = result.speed['postprocess'] / 1000 + time.perf_counter() - started
+
+        started = time.perf_counter()
+        get_nutrition_by_dish(predictions[0]['class_name'])
+        timings['nutrition'] = time.perf_counter() - started
+
+        if user is not None:
+            started = time.perf_counter()
+            ImageUpload.objects.create(
+                user=user, image='images/benchmark.jpg', prediction=predictions[0]['class_name'],
+                status=ImageUpload.STATUS_COMPLETED,
+            )
+            timings['db_write'] = time.perf_counter() - started
+
+        timings['total'] = sum(timings.values())
+        return timings
+
+    def summarize(self, runs):
+        summary = {
+            'runs': len(runs),
+            'latency_ms': {key: value * 1000 for key, value in percentiles([run['total'] for run in runs]).items()},
+            'throughput_per_second': len(runs) / sum(run['total'] for run in runs),
+            'stages_ms': {},
+        }
+        for stage in STAGES:
+            values = [run[stage] for run in runs if stage in run]
+            if values:
+                summary['stages_ms'][stage] = {key: value * 1000 for key, value in percentiles(values).items()}
+        return summary
+
+    def benchmark_model(self, path, inputs, options, user):
+        # Cold: nothing loaded yet, the first request pays for loading
+        registry.clear()
+        started = time.perf_counter()
+        model = registry.get_model(path)
+        load_seconds = time.perf_counter() - started
+        imgsz = model.overrides.get('imgsz') or 640
+        imgsz = min(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+        report = {'weights': str(path), 'imgsz': imgsz, 'load_ms': load_seconds * 1000, 'inputs': {}}
+        first_input = next(iter(inputs.values()))[0]
+        cold = self.run_once(model, first_input, imgsz, user)
+        report['cold_first_request_ms'] = (load_seconds + cold['total']) * 1000
+
+        for name, images in inputs.items():
+            runs = []
+            for iteration in range(options['iterations']):
+                runs.append(self.run_once(model, images[iteration % len(images)], imgsz, user))
+            report['inputs'][name] = self.summarize(runs)
+        return report
+
+    def handle(self, *args, **options):
+        models = self.get_models(options)
+        inputs = self.get_inputs(options)
+
+        report = {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'iterations': options['iterations'],
+            'models': {},
+        }
+
+        # DB writes go to a throwaway user inside a transaction that is
+        # rolled back, so benchmarking leaves the database untouched
+        with transaction.atomic():
+            user = None
+            if not options['skip_db']:
+                user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            for path in models:
+                self.stderr.write(f"Benchmarking {path}")
+                report['models'][str(path)] = self.benchmark_model(path, inputs, options, user)
+            transaction.set_rollback(True)
+
+        report['peak_rss_mb'] = peak_rss_mb()
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,71 @@
+import csv
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from image_api.nutrition import CSV_PATH, NutritionTable
+
+
+def pandas_lookup(df, dish_name):
+    """The previous get_nutrition_by_dish: boolean mask over the DataFrame"""
+    row = df[df['dish_name'] == dish_name]
+    if row.empty:
+        return None
+    return row.iloc[0].to_dict()
+
+
+def csv_scan_lookup(csv_path, dish_name):
+    """The previous get_row_as_json: re-open and scan the CSV"""
+    with open(csv_path, 'r', newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            if row['dish_name'] == dish_name:
+                return row
+    return None
+
+
+class Command(BaseCommand):
+    help = "Compare the nutrition table lookup with the pandas mask and CSV scan it replaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=str(CSV_PATH), help='Nutrient CSV to load')
+        parser.add_argument('--lookups', type=int, default=2000, help='Lookups per implementation')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        table = NutritionTable(options['csv'])
+        table.refresh()
+        rng = random.Random(0)
+        names = [rng.choice(table.names) for _ in range(options['lookups'])]
+
+        implementations = {'table': lambda name: table.get(name)}
+        try:
+            import pandas as pd
+        except ImportError:
+            self.stderr.write("pandas is not installed, skipping the DataFrame baseline")
+        else:
+            df = pd.read_csv(options['csv'])
+            implementations['pandas_mask'] = lambda name: pandas_lookup(df, name)
+        implementations['csv_scan'] = lambda name: csv_scan_lookup(options['csv'], name)
+
+        rows = []
+        for label, lookup in implementations.items():
+            seconds = timeit.timeit(lambda: [lookup(name) for name in names], number=1)
+            rows.append({
+                'implementation': label,
+                'lookups': len(names),
+                'microseconds_per_lookup': seconds / len(names) * 1e6,
+            })
+        baseline = rows[0]['microseconds_per_lookup']
+        for row in rows:
+            row['relative_to_table'] = row['microseconds_per_lookup'] / baseline
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        self.stdout.write(f"{'implementation':<14} {'us/lookup':>11} {'x table':>9}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['implementation']:<14} {row['microseconds_per_lookup']:>11.2f} {row['relative_to_table']:>9.1f}"
+            )
@@ -0,0 +1,99 @@
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from image_api.backends import BACKEND_PYTORCH, find_images, weights_path
+from image_api.model_registry import registry
+from image_api.prediction import MODEL_PATH
+
+
+def parse_backend(spec):
+    """Split 'onnx-int8' style names into (backend, int8)"""
+    backend, _, variant = spec.partition('-')
+    if variant not in ('', 'int8'):
+        raise CommandError(f"Unknown backend variant '{spec}'")
+    return backend, variant == 'int8'
+
+
+class Command(BaseCommand):
+    help = "Compare top-1 accuracy and latency of the inference backends against PyTorch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', help='Image directory; class sub-folders are used as labels')
+        parser.add_argument('--backends', default='pytorch,onnx,onnx-int8',
+                            help='Comma separated backends, e.g. pytorch,onnx,onnx-int8,openvino-int8')
+        parser.add_argument('--weights', default=str(MODEL_PATH), help='PyTorch checkpoint the exports came from')
+        parser.add_argument('--limit', type=int, default=200, help='Number of images to sample')
+        parser.add_argument('--tolerance', type=float, default=0.01,
+                            help='Largest allowed drop in top-1 agreement with PyTorch')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def run_backend(self, path, images):
+        model = registry.get_model(path)
+        model.predict(images[0][1], verbose=False)
+        top1, latencies = [], []
+        for _, image in images:
+            started = time.perf_counter()
+            result = model.predict(image, verbose=False)[0]
+            latencies.append(time.perf_counter() - started)
+            top1.append(result.names[int(result.probs.top1)])
+        return top1, np.array(latencies) * 1000
+
+    def handle(self, *args, **options):
+        specs = [spec.strip() for spec in options['backends'].split(',')]
+        if specs[0] != BACKEND_PYTORCH:
+            specs.insert(0, BACKEND_PYTORCH)
+
+        images = []
+        for path in find_images(options['images'], limit=options['limit']):
+            image = cv2.imread(str(path))
+            if image is not None:
+                images.append((path.parent.name, image))
+        if not images:
+            raise CommandError(f"No images found in {options['images']}")
+
+        # Folder names only count as labels when they are known class names
+        class_names = set(registry.get_model(options['weights']).names.values())
+        labels = [label if label in class_names else None for label, _ in images]
+
+        rows = []
+        reference = None
+        for spec in specs:
+            backend, int8 = parse_backend(spec)
+            path = weights_path(options['weights'], backend, int8)
+            if not Path(path).exists():
+                raise CommandError(f"{path} not found, create it with manage.py export_model")
+
+            top1, latencies = self.run_backend(path, images)
+            if reference is None:
+                reference = top1
+            labelled = [(label, pred) for label, pred in zip(labels, top1) if label is not None]
+            rows.append({
+                'backend': spec,
+                'weights': str(path),
+                'images': len(images),
+                'top1_accuracy': float(np.mean([label == pred for label, pred in labelled])) if labelled else None,
+                'top1_agreement': float(np.mean([a == b for a, b in zip(top1, reference)])),
+                'mean_latency_ms': float(latencies.mean()),
+                'p95_latency_ms': float(np.percentile(latencies, 95)),
+            })
+
+        failed = [row['backend'] for row in rows if 1.0 - row['top1_agreement'] > options['tolerance']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+        else:
+            self.stdout.write(f"{'backend':<16} {'top1 acc':>9} {'agree':>7} {'mean ms':>9} {'p95 ms':>9}")
+            for row in rows:
+                accuracy = f"{row['top1_accuracy']:.3f}" if row['top1_accuracy'] is not None else '-'
+                self.stdout.write(
+                    f"{row['backend']:<16} {accuracy:>9} {row['top1_agreement']:>7.3f} "
+                    f"{row['mean_latency_ms']:>9.2f} {row['p95_latency_ms']:>9.2f}"
+                )
+
+        if failed:
+            raise CommandError(f"Top-1 agreement outside tolerance for: {', '.join(failed)}")
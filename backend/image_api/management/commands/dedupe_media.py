@@ -0,0 +1,140 @@
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from image_api.models import ImageUpload, MediaBlob
+from image_api.storage import content_digest, content_name, image_storage
+
+FILE_FIELDS = ('image', 'original_image')
+CONTENT_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def link_or_copy(source, target):
+    """
+    Give a file a second name, a hard link where the file system allows it
+
+    A copy is written to a temporary file and renamed into place, so the
+    target never exists half written.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+        return
+    except FileExistsError:
+        return
+    except OSError:
+        pass
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.upload-')
+    os.close(descriptor)
+    try:
+        shutil.copyfile(source, temporary_path)
+        os.replace(temporary_path, target)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+
+
+class Command(BaseCommand):
+    help = "Move stored uploads to content-addressed names, dropping duplicate files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows updated per query')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Delete tracked blobs that no upload references any more')
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        dry_run = options['dry_run']
+        renamed = {}
+        new_names = set()
+        # Old names are only deleted once every row points at the new ones
+        replaced = set()
+        stats = Counter()
+
+        for field in FILE_FIELDS:
+            updates = []
+            rows = (
+                ImageUpload.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list('pk', field).iterator(chunk_size=options['batch_size'])
+            )
+            for pk, name in rows:
+                if CONTENT_NAME.search(name):
+                    continue
+                if name not in renamed:
+                    if not storage.exists(name):
+                        stats['missing'] += 1
+                        self.stderr.write(f"Missing file {name} (upload {pk})")
+                        continue
+                    with storage.open(name, 'rb') as f:
+                        new_name = content_name(name, content_digest(f))
+                    if new_name in new_names or storage.exists(new_name):
+                        stats['duplicate_files'] += 1
+                        stats['bytes_reclaimed'] += storage.size(name)
+                    else:
+                        stats['moved_files'] += 1
+                        if not dry_run:
+                            link_or_copy(storage.path(name), storage.path(new_name))
+                    replaced.add(name)
+                    renamed[name] = new_name
+                    new_names.add(new_name)
+                updates.append(ImageUpload(pk=pk, **{field: renamed[name]}))
+                stats['rows_updated'] += 1
+                if len(updates) >= options['batch_size']:
+                    self.save_rows(updates, field, dry_run)
+                    updates = []
+            self.save_rows(updates, field, dry_run)
+
+        if not dry_run:
+            # Each batch of rows was committed by bulk_update(), so an
+            # interrupted run leaves the old files in place and can be rerun
+            for name in replaced:
+                storage.delete(name)
+            stats['orphan_blobs'] = self.recount(storage, options['delete_orphans'])
+
+        prefix = "Would have " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}moved {stats['moved_files']} files, removed {stats['duplicate_files']} duplicates "
+            f"({stats['bytes_reclaimed'] / (1024 * 1024):.1f} MB) and updated {stats['rows_updated']} rows; "
+            f"{stats['missing']} files missing, {stats['orphan_blobs']} unreferenced blobs"
+        ))
+
+    def save_rows(self, updates, field, dry_run):
+        if updates and not dry_run:
+            ImageUpload.objects.bulk_update(updates, [field])
+
+    def recount(self, storage, delete_orphans):
+        """Set every blob's reference count from the rows pointing at it"""
+        references = Counter()
+        for field in FILE_FIELDS:
+            for row in ImageUpload.objects.exclude(**{field: ''}).values(field).annotate(count=Count('pk')):
+                name = row[field]
+                if name and CONTENT_NAME.search(name):
+                    references[name] += row['count']
+
+        with transaction.atomic():
+            MediaBlob.objects.bulk_create(
+                [MediaBlob(name=name, size=storage.size(name), ref_count=count)
+                 for name, count in references.items() if storage.exists(name)],
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['ref_count'],
+            )
+            orphan_names = [
+                name for name in MediaBlob.objects.values_list('name', flat=True).iterator()
+                if name not in references
+            ]
+            orphans = MediaBlob.objects.filter(name__in=orphan_names)
+            if delete_orphans:
+                orphans.delete()
+                transaction.on_commit(lambda: [storage.delete(name) for name in orphan_names])
+            else:
+                orphans.update(ref_count=0)
+        return len(orphan_names)
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from image_api.backends import BACKEND_ONNX, BACKEND_OPENVINO, export_model
+from image_api.prediction import MODEL_PATH
+
+
+class Command(BaseCommand):
+    help = "Export the trained classifier to ONNX or OpenVINO, optionally INT8 quantized"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=[BACKEND_ONNX, BACKEND_OPENVINO], default=BACKEND_ONNX)
+        parser.add_argument('--weights', default=str(MODEL_PATH), help='PyTorch checkpoint to export')
+        parser.add_argument('--int8', action='store_true', help='Apply post-training INT8 quantization')
+        parser.add_argument('--calibration-dir', help='Sample of the dataset used to calibrate INT8')
+        parser.add_argument('--calibration-samples', type=int, default=200, help='Calibration images to use')
+        parser.add_argument('--imgsz', type=int, help='Input size, defaults to the training size')
+        parser.add_argument('--max-batch-size', type=int, default=8, help='Largest batch to support')
+
+    def handle(self, *args, **options):
+        if not Path(options['weights']).exists():
+            raise CommandError(f"Model weights not found: {options['weights']}")
+
+        try:
+            target = export_model(
+                options['weights'],
+                options['format'],
+                int8=options['int8'],
+                calibration_dir=options['calibration_dir'],
+                calibration_samples=options['calibration_samples'],
+                imgsz=options['imgsz'],
+                max_batch_size=options['max_batch_size'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {target}"))
+        self.stdout.write(
+            f"Serve it with IMAGE_API = {{'INFERENCE_BACKEND': '{options['format']}', "
+            f"'INFERENCE_INT8': {options['int8']}}}"
+        )
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from image_api.models import ImageUpload
+from image_api.thumbnails import make_derivatives, thumbnail_sizes
+
+
+class Command(BaseCommand):
+    help = "Generate missing thumbnails of stored uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', help='Comma separated sizes, default all configured')
+        parser.add_argument('--force', action='store_true', help='Regenerate existing thumbnails')
+        parser.add_argument('--workers', type=int, default=4, help='Images processed in parallel')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'].split(',') if options['sizes'] else list(thumbnail_sizes())
+        unknown = [size for size in sizes if size not in thumbnail_sizes()]
+        if unknown:
+            raise CommandError(f"Unknown sizes {', '.join(unknown)}, configured: {', '.join(thumbnail_sizes())}")
+
+        # Deduplicated uploads share a file, so every image name is done once
+        names = (
+            ImageUpload.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct().iterator(chunk_size=1000)
+        )
+
+        def generate(name):
+            try:
+                return name, make_derivatives(name, sizes=sizes, force=options['force']), None
+            except Exception as exc:
+                return name, [], exc
+
+        images = written = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for name, generated, error in pool.map(generate, names):
+                images += 1
+                written += len(generated)
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {images} images, wrote {written} thumbnails, {failed} failed"
+        ))
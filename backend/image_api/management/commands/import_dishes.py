@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from image_api.catalog import bump_catalog_version
+from image_api.models import Dish
+from image_api.nutrition import CSV_PATH, read_csv
+
+
+class Command(BaseCommand):
+    help = "Import or update the dish catalog from a nutrient CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=str(CSV_PATH), help='Nutrient CSV with a dish_name column')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per INSERT ... ON CONFLICT statement')
+        parser.add_argument('--prune', action='store_true', help='Delete dishes that are not in the CSV')
+
+    def handle(self, *args, **options):
+        try:
+            columns, names, rows = read_csv(options['csv'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {options['csv']}: {exc}")
+        unknown = [column for column in columns if column not in Dish.NUTRIENT_FIELDS]
+        if unknown:
+            raise CommandError(f"Unknown nutrient columns: {', '.join(unknown)}")
+
+        fields = [Dish.NUTRIENT_FIELDS[column] for column in columns]
+        # The last row wins when a name appears twice
+        dishes = {
+            name: Dish(name=name, **dict(zip(fields, values)))
+            for name, values in zip(names, rows)
+        }
+
+        with transaction.atomic():
+            existing = Dish.objects.count()
+            Dish.objects.bulk_create(
+                list(dishes.values()),
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=fields + ['updated_at'],
+            )
+            pruned = 0
+            if options['prune']:
+                pruned, _ = Dish.objects.exclude(name__in=list(dishes)).delete()
+            # bulk_create sends no signals, so invalidate the cached catalog here
+            transaction.on_commit(bump_catalog_version)
+
+        total = Dish.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(dishes)} dishes ({total - existing + pruned} new, {pruned} pruned), {total} in catalog"
+        ))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from image_api.jobs import run_ingest
+from image_api.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encode uploads still stored as received, e.g. when their job was lost "
+        "to a restart or turned away by a full ingest queue"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=600,
+                            help='Only uploads made at least this many seconds ago, still queued in a live worker otherwise')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        upload_ids = list(
+            ImageUpload.objects.filter(ingested=False, timestamp__lt=cutoff)
+            .exclude(image='').values_list('pk', flat=True)
+        )
+
+        failed = 0
+        for upload_id in upload_ids:
+            upload = ImageUpload.objects.filter(pk=upload_id).only('image').first()
+            if upload is None:
+                continue
+            try:
+                with upload.image.open('rb') as f:
+                    data = f.read()
+            except OSError as exc:
+                failed += 1
+                self.stderr.write(f"Upload {upload_id}: {exc}")
+                continue
+            run_ingest(upload_id, data)
+
+        remaining = ImageUpload.objects.filter(pk__in=upload_ids, ingested=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(upload_ids)} uploads, {len(upload_ids) - remaining} done, "
+            f"{remaining} still waiting ({failed} unreadable)"
+        ))
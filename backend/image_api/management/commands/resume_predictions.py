@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from image_api.jobs import run_prediction
+from image_api.models import ImageUpload
+
+INTERRUPTED_ERROR = "Prediction was interrupted, upload the image again."
+
+
+class Command(BaseCommand):
+    help = (
+        "Predict async uploads left pending or processing by a worker restart, "
+        "or mark them failed with --fail"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=600,
+                            help='Only uploads made at least this many seconds ago, still queued in a live worker otherwise')
+        parser.add_argument('--fail', action='store_true', help='Mark the uploads failed instead of predicting them')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        stale = ImageUpload.objects.filter(
+            status__in=[ImageUpload.STATUS_PENDING, ImageUpload.STATUS_PROCESSING], timestamp__lt=cutoff,
+        )
+
+        if options['fail']:
+            failed = stale.update(status=ImageUpload.STATUS_FAILED, error=INTERRUPTED_ERROR)
+            self.stdout.write(self.style.SUCCESS(f"Marked {failed} uploads failed"))
+            return
+
+        # The upload bytes were lost with the worker, so they are read back
+        # from storage; top_k and expected were not stored, the defaults apply
+        upload_ids = list(stale.values_list('pk', flat=True))
+        for upload_id in upload_ids:
+            ImageUpload.objects.filter(pk=upload_id, status=ImageUpload.STATUS_PROCESSING).update(
+                status=ImageUpload.STATUS_PENDING,
+            )
+            run_prediction(upload_id)
+
+        completed = ImageUpload.objects.filter(pk__in=upload_ids, status=ImageUpload.STATUS_COMPLETED).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Predicted {len(upload_ids)} uploads, {completed} completed, {len(upload_ids) - completed} failed"
+        ))
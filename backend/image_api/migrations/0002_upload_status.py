@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 08:42
+
+import uuid
+from django.db import migrations, models
+
+
+def mark_existing_uploads_completed(apps, schema_editor):
+    # Uploads made before the status field existed were processed inline
+    ImageUpload = apps.get_model('image_api', 'ImageUpload')
+    ImageUpload.objects.filter(prediction__isnull=False).update(status='completed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='prediction_detail',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='prediction_id',
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.RunPython(mark_existing_uploads_completed, migrations.RunPython.noop),
+    ]
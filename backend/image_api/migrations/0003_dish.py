@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0002_upload_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dish',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('calories_kcal', models.FloatField(blank=True, null=True)),
+                ('carbohydrates_g', models.FloatField(blank=True, null=True)),
+                ('protein_g', models.FloatField(blank=True, null=True)),
+                ('fats_g', models.FloatField(blank=True, null=True)),
+                ('sugar_g', models.FloatField(blank=True, null=True)),
+                ('fibre_g', models.FloatField(blank=True, null=True)),
+                ('sodium_mg', models.FloatField(blank=True, null=True)),
+                ('calcium_mg', models.FloatField(blank=True, null=True)),
+                ('iron_mg', models.FloatField(blank=True, null=True)),
+                ('vitamin_c_mg', models.FloatField(blank=True, null=True)),
+                ('folate_microg', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'dishes',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 09:00
+
+import image_api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0003_dish'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='original_bytes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='original_image',
+            field=models.FileField(blank=True, null=True, upload_to=image_api.models.original_upload_path),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='stored_bytes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
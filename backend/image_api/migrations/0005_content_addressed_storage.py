@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 09:02
+
+import image_api.models
+import image_api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0004_upload_ingest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='image',
+            field=models.ImageField(storage=image_api.storage.image_storage, upload_to=image_api.models.image_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='original_image',
+            field=models.FileField(blank=True, null=True, storage=image_api.storage.image_storage, upload_to=image_api.models.original_upload_path),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0005_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='available_thumbnails',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+def mark_unprocessed(apps, schema_editor):
+    # Uploads still stored at their original size may have lost their
+    # re-encode job; reencode_uploads checks them once
+    ImageUpload = apps.get_model('image_api', 'ImageUpload')
+    ImageUpload.objects.filter(
+        original_bytes__isnull=False, stored_bytes=models.F('original_bytes'),
+    ).update(ingested=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_api', '0006_upload_available_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='ingested',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(mark_unprocessed, migrations.RunPython.noop),
+    ]
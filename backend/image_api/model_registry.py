@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _load_yolo(model_path):
+    from ultralytics import YOLO
+    from .backends import exported_imgsz
+
+    # The task is given explicitly so exported ONNX/OpenVINO weights load too
+    model = YOLO(model_path, task='classify')
+    if not str(model_path).endswith('.pt'):
+        imgsz = exported_imgsz(model_path)
+        if imgsz:
+            model.overrides['imgsz'] = imgsz
+    return model
+
+
+def file_signature(model_path):
+    """Return (mtime_ns, size) of the weights file, or None if it is missing"""
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class LoadedModel:
+    """A model instance together with the file state it was loaded from"""
+
+    def __init__(self, model, path, signature, load_seconds):
+        self.model = model
+        self.path = path
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        # Ultralytics predictors are not safe to share between threads, so
+        # every loaded model carries its own lock. A hot reload creates a new
+        # entry (and a new lock), leaving in-flight requests on the old one.
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models keyed by weights path
+
+    Each weights file is loaded once per process. When the file changes on
+    disk the next lookup loads the new weights and swaps the entry in one
+    assignment; requests already holding the previous model keep using it
+    until they finish.
+    """
+
+    def __init__(self, loader=_load_yolo):
+        self._loader = loader
+        self._entries = {}
+        self._stats = {}
+        self._failed_signatures = {}
+        self._lock = threading.Lock()
+
+    def _get_entry(self, model_path):
+        path = str(Path(model_path).resolve())
+        signature = file_signature(path)
+        entry = self._entries.get(path)
+        if entry is not None and (signature is None or entry.signature == signature):
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and (signature is None or entry.signature == signature):
+                return entry
+            if entry is not None and self._failed_signatures.get(path) == signature:
+                # The new file could not be loaded (e.g. still being copied);
+                # keep serving the previous model until it changes again.
+                return entry
+            return self._load(path, signature, previous=entry)
+
+    def _load(self, path, signature, previous=None):
+        started = time.perf_counter()
+        try:
+            model = self._loader(path)
+        except Exception:
+            if previous is None:
+                raise
+            logger.exception("Reloading %s failed, keeping the previous model", path)
+            self._failed_signatures[path] = signature
+            return previous
+        load_seconds = time.perf_counter() - started
+
+        entry = LoadedModel(model, path, signature, load_seconds)
+        self._entries[path] = entry
+        self._failed_signatures.pop(path, None)
+
+        stats = self._stats.setdefault(path, {"load_count": 0, "total_load_seconds": 0.0})
+        stats["load_count"] += 1
+        stats["total_load_seconds"] += load_seconds
+        logger.info("Loaded model %s in %.3fs (load #%d)", path, load_seconds, stats["load_count"])
+        return entry
+
+    def get_model(self, model_path):
+        """
+        Return the loaded model for a weights file, loading it if needed
+
+        Args:
+            model_path: Path to the model weights
+
+        Returns:
+            Loaded model instance
+        """
+        return self._get_entry(model_path).model
+
+    def get_entry(self, model_path):
+        """Return the LoadedModel entry for a weights file, loading it if needed"""
+        return self._get_entry(model_path)
+
+    @contextmanager
+    def use_model(self, model_path):
+        """
+        Context manager yielding a model with exclusive use for inference
+
+        Args:
+            model_path: Path to the model weights
+        """
+        entry = self._get_entry(model_path)
+        with entry.lock:
+            yield entry.model
+
+    def stats(self):
+        """
+        Return load statistics for every weights file seen by this process
+
+        Returns:
+            Dictionary keyed by weights path
+        """
+        with self._lock:
+            result = {}
+            for path, stats in self._stats.items():
+                entry = self._entries.get(path)
+                result[path] = {
+                    "load_count": stats["load_count"],
+                    "total_load_seconds": stats["total_load_seconds"],
+                    "last_load_seconds": entry.load_seconds if entry else None,
+                    "loaded_at": entry.loaded_at if entry else None,
+                    "pid": os.getpid(),
+                }
+            return result
+
+    def clear(self):
+        """Drop every loaded model (mainly for tests)"""
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self._failed_signatures.clear()
+
+
+registry = ModelRegistry()
@@ -1,18 +1,46 @@
 from django.db import models
 import uuid
 from django.contrib.auth.models import User
+from .storage import image_storage
 
 def image_upload_path(instance, filename):
     ext = filename.split('.')[-1]
     filename = f"{uuid.uuid4()}.{ext}"
     return f"images/{filename}"
 
+def original_upload_path(instance, filename):
+    ext = filename.split('.')[-1]
+    filename = f"{uuid.uuid4()}.{ext}"
+    return f"originals/{filename}"
+
 class ImageUpload(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_uploads')
-    image = models.ImageField(upload_to=image_upload_path)
+    image = models.ImageField(upload_to=image_upload_path, storage=image_storage)
     timestamp = models.DateTimeField(auto_now_add=True)
     prediction = models.CharField(max_length=255, null=True, blank=True)
-    prediction_id = models.UUIDField(default=uuid.uuid4, editable=False)
+    prediction_id = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    prediction_detail = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # The upload as received, only kept when IMAGE_API['INGEST_KEEP_ORIGINAL'] is set
+    original_image = models.FileField(upload_to=original_upload_path, storage=image_storage, null=True, blank=True)
+    original_bytes = models.PositiveIntegerField(null=True, blank=True)
+    stored_bytes = models.PositiveIntegerField(null=True, blank=True)
+    # Whether the stored image is final, i.e. was re-encoded or did not need it
+    ingested = models.BooleanField(default=True)
+    # Thumbnail sizes generated for the stored image (see thumbnails.py)
+    available_thumbnails = models.JSONField(default=list, blank=True)
     
     def __str__(self):
         return f"Image {self.id} - {self.prediction or 'No prediction'}"
@@ -24,4 +52,53 @@ class PredictionFeedback(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"Feedback for Image {self.image.id}"
\ No newline at end of file
+        return f"Feedback for Image {self.image.id}"
+
+class Dish(models.Model):
+    """A dish of the nutrition catalog, with nutrient values per 100g"""
+
+    # CSV column -> model field
+    NUTRIENT_FIELDS = {
+        'calories(kcal)': 'calories_kcal',
+        'carbohydrates(g)': 'carbohydrates_g',
+        'protein(g)': 'protein_g',
+        'fats(g)': 'fats_g',
+        'sugar(g)': 'sugar_g',
+        'fibre(g)': 'fibre_g',
+        'sodium(mg)': 'sodium_mg',
+        'calcium(mg)': 'calcium_mg',
+        'iron(mg)': 'iron_mg',
+        'vitamin_c(mg)': 'vitamin_c_mg',
+        'folate(microg)': 'folate_microg',
+    }
+
+    name = models.CharField(max_length=255, unique=True)
+    calories_kcal = models.FloatField(null=True, blank=True)
+    carbohydrates_g = models.FloatField(null=True, blank=True)
+    protein_g = models.FloatField(null=True, blank=True)
+    fats_g = models.FloatField(null=True, blank=True)
+    sugar_g = models.FloatField(null=True, blank=True)
+    fibre_g = models.FloatField(null=True, blank=True)
+    sodium_mg = models.FloatField(null=True, blank=True)
+    calcium_mg = models.FloatField(null=True, blank=True)
+    iron_mg = models.FloatField(null=True, blank=True)
+    vitamin_c_mg = models.FloatField(null=True, blank=True)
+    folate_microg = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'dishes'
+
+    def __str__(self):
+        return self.name
+
+class MediaBlob(models.Model):
+    """A stored file and the number of file fields referencing it"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
@@ -0,0 +1,277 @@
+import csv
+import os
+import threading
+from pathlib import Path
+
+from .conf import get_setting
+from .lazy import np
+
+CSV_PATH = Path(__file__).resolve().parent / "nutrient_values.csv"
+NAME_COLUMN = "dish_name"
+# The CSV lists nutrient values per 100g portion
+REFERENCE_GRAMS = 100.0
+
+
+class NutritionSnapshot:
+    """
+    One immutable version of the nutrient table
+
+    A float64 matrix with one row per dish and one column per nutrient, plus
+    a dict from dish name to row number, so a lookup is a dict access
+    instead of a DataFrame scan. Class matrices derived from it are cached
+    on the snapshot itself, so they can never be paired with another
+    version of the values.
+    """
+
+    __slots__ = ('columns', 'names', 'values', 'index', '_class_matrices')
+
+    def __init__(self, columns, names, values):
+        self.columns = tuple(columns)
+        self.names = tuple(names)
+        self.values = values
+        self.index = {name: position for position, name in enumerate(self.names)}
+        self._class_matrices = {}
+
+    @classmethod
+    def from_rows(cls, columns, names, rows):
+        """Snapshot of rows of nutrient values (None for missing)"""
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns))
+        values.setflags(write=False)
+        return cls(columns, names, values)
+
+    def row(self, dish_name):
+        position = self.index.get(dish_name)
+        if position is None:
+            return None
+        return self.values[position]
+
+    def get(self, dish_name):
+        values = self.row(dish_name)
+        if values is None:
+            return None
+        result = {NAME_COLUMN: dish_name}
+        # Missing values come back as None so the result stays valid JSON
+        result.update((column, value if value == value else None) for column, value in zip(self.columns, values.tolist()))
+        return result
+
+    def portions(self, dish_names, grams):
+        positions = np.fromiter((self.index.get(name, -1) for name in dish_names), dtype=np.intp, count=len(dish_names))
+        found = positions >= 0
+        scaled = np.full((len(positions), len(self.columns)), np.nan)
+        scaled[found] = self.values[positions[found]] * (np.asarray(grams, dtype=np.float64)[found, None] / REFERENCE_GRAMS)
+        # Nutrients missing from the CSV count as zero in the totals
+        return found, scaled, np.nansum(scaled[found], axis=0)
+
+    def class_matrix(self, class_names):
+        class_names = tuple(class_names)
+        cached = self._class_matrices.get(class_names)
+        if cached is not None:
+            return cached
+
+        positions = np.array([self.index.get(name, -1) for name in class_names], dtype=np.intp)
+        known = positions >= 0
+        matrix = np.zeros((len(class_names), len(self.columns)))
+        # Nutrients missing from the CSV contribute nothing
+        matrix[known] = np.nan_to_num(self.values[positions[known]])
+        matrix.setflags(write=False)
+        known.setflags(write=False)
+        self._class_matrices[class_names] = (matrix, known)
+        return matrix, known
+
+    def expected(self, class_names, class_ids, probabilities):
+        matrix, known = self.class_matrix(class_names)
+        class_ids = np.asarray(class_ids, dtype=np.intp)
+        weights = np.asarray(probabilities, dtype=np.float64) * known[class_ids]
+        coverage = float(weights.sum())
+        if coverage <= 0:
+            return None, 0.0
+        return (weights / coverage) @ matrix[class_ids], coverage
+
+
+_EMPTY = NutritionSnapshot((), (), None)
+
+
+class NutritionTable:
+    """
+    In-memory nutrient table indexed by dish name
+
+    The CSV is parsed once into a NutritionSnapshot. The file's mtime is
+    checked on access and a new snapshot is built when the CSV changes,
+    then published with a single attribute assignment; readers that need
+    several of its parts should take one reference with snapshot(), so a
+    concurrent reload cannot mix two versions. Nothing is read (and numpy
+    is not imported) until the first lookup. DishCatalogTable in catalog.py
+    builds the same table from the database.
+    """
+
+    def __init__(self, csv_path=CSV_PATH):
+        self.csv_path = Path(csv_path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._snapshot = _EMPTY
+
+    # Parts of the current snapshot, for callers that only need one of them
+    columns = property(lambda self: self._snapshot.columns)
+    names = property(lambda self: self._snapshot.names)
+    values = property(lambda self: self._snapshot.values)
+    index = property(lambda self: self._snapshot.index)
+
+    def _source_signature(self):
+        """State of the data source; the table is rebuilt when it changes"""
+        stat = os.stat(self.csv_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, signature):
+        self._build(*read_csv(self.csv_path))
+
+    def _build(self, columns, names, rows):
+        """Replace the table with rows of nutrient values (None for missing)"""
+        self._snapshot = NutritionSnapshot.from_rows(columns, names, rows)
+
+    def refresh(self):
+        """Reload the table if its source changed since it was last read"""
+        signature = self._source_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature != self._signature:
+                self._load(signature)
+                self._signature = signature
+
+    def snapshot(self):
+        """The current NutritionSnapshot, reloaded first if the source changed"""
+        self.refresh()
+        return self._snapshot
+
+    def row(self, dish_name):
+        """
+        Nutrient values of a dish in column order
+
+        Args:
+            dish_name: Exact dish name
+
+        Returns:
+            Read-only numpy array, or None if the dish is unknown
+        """
+        return self.snapshot().row(dish_name)
+
+    def get(self, dish_name):
+        """
+        Nutrient values of a dish as a dictionary
+
+        Args:
+            dish_name: Exact dish name
+
+        Returns:
+            Dictionary with dish_name and every nutrient column, or None
+        """
+        return self.snapshot().get(dish_name)
+
+    def portions(self, dish_names, grams):
+        """
+        Nutrient values of many portions at once
+
+        Rows are gathered with one fancy-index and scaled by the portion
+        sizes with a single broadcast multiply.
+
+        Args:
+            dish_names: Sequence of exact dish names
+            grams: Portion size of each dish in grams
+
+        Returns:
+            Tuple of (found, values, totals): a boolean array marking the
+            known dishes, an (items, columns) matrix where unknown dishes are
+            NaN, and the column sums over the known dishes
+        """
+        return self.snapshot().portions(dish_names, grams)
+
+    def class_matrix(self, class_names):
+        """
+        Nutrient matrix aligned to a model's class list
+
+        Built once per class list and kept until the CSV changes, so it can
+        be prepared when the model is loaded.
+
+        Args:
+            class_names: Class names in class id order
+
+        Returns:
+            Tuple of (matrix, known): a read-only (classes, columns) matrix
+            with zero rows for classes missing from the table, and a boolean
+            array marking the classes that are in it
+        """
+        return self.snapshot().class_matrix(class_names)
+
+    def expected(self, class_names, class_ids, probabilities):
+        """
+        Probability-weighted nutrient values over a model's candidate classes
+
+        The probabilities of the candidates that are in the table are
+        renormalized to sum to one and multiplied with their rows of the
+        class matrix.
+
+        Args:
+            class_names: The model's class names in class id order
+            class_ids: Candidate class ids, e.g. the top-k predictions
+            probabilities: Probability of each candidate
+
+        Returns:
+            Tuple of (values, coverage): nutrient values in column order (or
+            None when no candidate is in the table) and the probability mass
+            of the candidates that were used
+        """
+        return self.snapshot().expected(class_names, class_ids, probabilities)
+
+
+def read_csv(csv_path):
+    """
+    Parse a nutrient CSV
+
+    Returns:
+        Tuple of (columns, names, rows) with None for empty values
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        name_position = header.index(NAME_COLUMN)
+        columns = tuple(column for position, column in enumerate(header) if position != name_position)
+        names, rows = [], []
+        for row in reader:
+            if not row:
+                continue
+            names.append(row[name_position])
+            rows.append([
+                float(value) if value != '' else None
+                for position, value in enumerate(row) if position != name_position
+            ])
+    return columns, names, rows
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_nutrition_table(csv_path=None):
+    """
+    Return the process-wide NutritionTable
+
+    Args:
+        csv_path: Read this CSV file; by default the table comes from the
+            source set by NUTRITION_SOURCE
+    """
+    if csv_path is None and get_setting('NUTRITION_SOURCE') == 'database':
+        key = 'database'
+    else:
+        key = str(Path(csv_path or CSV_PATH).resolve())
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                if key == 'database':
+                    from .catalog import DishCatalogTable
+                    table = DishCatalogTable(CSV_PATH)
+                else:
+                    table = NutritionTable(key)
+                _tables[key] = table
+    return table
@@ -1,14 +1,21 @@
+import io
 import os
 import argparse
+import threading
 import json
-import numpy as np
 from pathlib import Path
-from PIL import Image
-from ultralytics import YOLO
-import cv2
+from .model_registry import registry
+from .conf import get_setting
+from .prediction_cache import PredictionCache
+from .backends import weights_path
+from .serving import build_model_server
+from .nutrition import CSV_PATH, get_nutrition_table
+# numpy and OpenCV are lazy modules (see lazy.py) and Pillow is imported
+# inside the functions that use it, so loading the URLconf (and with it every
+# manage.py command) does not pay for them. The warmup step loads them
+# before the workers fork.
+from .lazy import cv2, np
 MODEL_PATH = Path(__file__).resolve().parent / "best.pt"
-CSV_PATH = Path(__file__).resolve().parent / "nutrient_values.csv"
-import pandas as pd
 
 
 # Dictionary mapping food names to nutritional information (calories per 100g)
@@ -27,14 +34,16 @@ def load_model(model_path):
     """
     Load a trained YOLO model
     
+    The weights are loaded once per process through the model registry and
+    reloaded only when the file changes on disk.
+    
     Args:
         model_path: Path to the trained model weights
         
     Returns:
         Loaded YOLO model
     """
-    model = YOLO(model_path)
-    return model
+    return registry.get_model(model_path)
 
 def preprocess_image(image_path):
     """
@@ -52,7 +61,80 @@ def preprocess_image(image_path):
     
     return image
 
-def predict_food(model, image, conf_threshold=0.25):
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale by dropping DCT
+# coefficients, which is far cheaper than decoding 12MP and resizing
+REDUCED_DECODE_FLAGS = (
+    (8, 'IMREAD_REDUCED_COLOR_8'),
+    (4, 'IMREAD_REDUCED_COLOR_4'),
+    (2, 'IMREAD_REDUCED_COLOR_2'),
+)
+
+def image_dimensions(data):
+    """
+    Read (width, height) from the image header without decoding pixels
+    
+    Args:
+        data: Encoded image bytes
+        
+    Returns:
+        Tuple of (width, height), or None if the header cannot be parsed
+    """
+    from PIL import Image
+    
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+def decode_image(data, target_size=None):
+    """
+    Decode an encoded image held in memory
+    
+    When target_size is given, the largest reduced decoding scale that still
+    keeps the short side at or above target_size is used, so the
+    full-resolution array is never built.
+    
+    Args:
+        data: Encoded image bytes
+        target_size: Input size of the model, or None for a full decode
+        
+    Returns:
+        Decoded BGR image (numpy array)
+    """
+    flag = cv2.IMREAD_COLOR
+    if target_size:
+        dimensions = image_dimensions(data)
+        if dimensions:
+            short_side = min(dimensions)
+            for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                if short_side // factor >= target_size:
+                    flag = getattr(cv2, reduced_flag)
+                    break
+    
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        raise ValueError("Could not decode image")
+    
+    return image
+
+def read_image_bytes(source):
+    """
+    Return the encoded bytes of an upload, open file or path
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        data = source.read()
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return data
+    with open(source, "rb") as f:
+        return f.read()
+
+def predict_food(model, image, conf_threshold=0.25, top_k=5):
     """
     Predict food class for an image
     
@@ -60,6 +142,7 @@ def predict_food(model, image, conf_threshold=0.25):
         model: Trained YOLO model
         image: Input image (numpy array)
         conf_threshold: Confidence threshold for predictions
+        top_k: Number of best classes to return
         
     Returns:
         Dictionary with prediction results
@@ -68,36 +151,63 @@ def predict_food(model, image, conf_threshold=0.25):
     results = model.predict(image, conf=conf_threshold)
     result = results[0]  # Get first result (only one image)
     
-    # Process predictions
-    predictions = []
-    for i, prob in enumerate(result.probs.data):
-        class_id = int(i)
-        class_name = result.names[class_id]
-        confidence = float(prob)
-        
-        # Get nutrition info if available
-        nutrition = NUTRITION_INFO.get(class_name, {
+    predictions = rank_predictions(result, top_k)
+    for prediction in predictions:
+        prediction["nutrition"] = NUTRITION_INFO.get(prediction["class_name"], {
             "calories": "unknown",
             "protein": "unknown",
             "carbs": "unknown",
             "fat": "unknown"
         })
-        
-        predictions.append({
-            "class_id": class_id,
-            "class_name": class_name,
-            "confidence": confidence,
-            "nutrition": nutrition
-        })
-    
-    # Sort by confidence
-    predictions.sort(key=lambda x: x["confidence"], reverse=True)
     
     return {
         "top_prediction": predictions[0] if predictions else None,
-        "all_predictions": predictions
+        "top_predictions": predictions
     }
 
+def top_k_classes(probs, top_k):
+    """
+    Indices and probabilities of the k most likely classes
+    
+    Uses argpartition so only the k selected entries are sorted.
+    
+    Args:
+        probs: Class probability vector (torch tensor or numpy array)
+        top_k: Number of classes to return
+        
+    Returns:
+        Tuple of (class indices, probabilities), best first
+    """
+    if hasattr(probs, "cpu"):
+        probs = probs.cpu().numpy()
+    probs = np.asarray(probs).ravel()
+    top_k = max(1, min(int(top_k), probs.size))
+    
+    indices = np.argpartition(probs, -top_k)[-top_k:]
+    indices = indices[np.argsort(probs[indices])[::-1]]
+    return indices, probs[indices]
+
+def rank_predictions(result, top_k=1):
+    """
+    Turn a classification result into its k best predictions
+    
+    Args:
+        result: ultralytics Results object for a single image
+        top_k: Number of best classes to return
+        
+    Returns:
+        List of prediction dictionaries, best first
+    """
+    indices, confidences = top_k_classes(result.probs.data, top_k)
+    return [
+        {
+            "class_id": int(class_id),
+            "class_name": result.names[int(class_id)],
+            "confidence": float(confidence),
+        }
+        for class_id, confidence in zip(indices.tolist(), confidences.tolist())
+    ]
+
 def process_image_file(model, image_path, output_dir=None, save_json=False):
     """
     Process a single image file
@@ -141,39 +251,151 @@ def process_image_file(model, image_path, output_dir=None, save_json=False):
     
     return top_pred
 
-df = pd.read_csv(CSV_PATH)
-
 def get_nutrition_by_dish(dish_name):
-    # Read the CSV
+    """
+    Look up the nutrient values of a dish
+    
+    Args:
+        dish_name: Exact dish name as used in nutrient_values.csv
+        
+    Returns:
+        Dictionary with dish_name and every nutrient column, or an error
+    """
+    result = get_nutrition_table().get(dish_name)
+    if result is None:
+        return {"error": f"Dish '{dish_name}' not found."}
+    
+    return result
 
-    # Find the row matching the dish name
-    row = df[df['dish_name'] == dish_name]
+_model_server = None
+_setup_lock = threading.Lock()
 
-    if row.empty:
-        return {"error": f"Dish '{dish_name}' not found."}
+def get_model_path():
+    """
+    Return the weights served by the configured inference backend
+    
+    MODEL_PATH is the PyTorch checkpoint; the onnx and openvino backends
+    serve the exports created next to it by `manage.py export_model`.
+    """
+    return weights_path(MODEL_PATH, get_setting('INFERENCE_BACKEND'), get_setting('INFERENCE_INT8'))
 
-    # Convert the row to a dictionary
-    result = row.iloc[0].to_dict()
-    return result
+def get_model_server():
+    """
+    Return the process-wide server for the configured model versions
+    """
+    global _model_server
+    if _model_server is None:
+        with _setup_lock:
+            if _model_server is None:
+                _model_server = build_model_server(get_model_path())
+    return _model_server
+
+_prediction_cache = None
+
+def get_prediction_cache():
+    """
+    Return the process-wide prediction cache, or None when it is disabled
+    """
+    global _prediction_cache
+    if not get_setting('PREDICTION_CACHE_ENABLED'):
+        return None
+    if _prediction_cache is None:
+        with _setup_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache(
+                    max_entries=get_setting('PREDICTION_CACHE_SIZE'),
+                    mode=get_setting('PREDICTION_CACHE_MODE'),
+                    max_distance=get_setting('PREDICTION_CACHE_MAX_DISTANCE'),
+                )
+    return _prediction_cache
 
-def predict_image_content(image_path):
+def expected_nutrition(class_names, predictions):
+    """
+    Nutrition averaged over ranked predictions, weighted by confidence
     
+    Args:
+        class_names: The model's class names in class id order
+        predictions: Ranked predictions as returned by rank_predictions
+        
+    Returns:
+        Dictionary with the expected nutrient values and the probability
+        mass they cover, or None if no predicted class has nutrition data
+    """
+    table = get_nutrition_table().snapshot()
+    values, coverage = table.expected(
+        class_names,
+        [prediction["class_id"] for prediction in predictions],
+        [prediction["confidence"] for prediction in predictions],
+    )
+    if values is None:
+        return None
     
-    # Load model
-    model = load_model(MODEL_PATH)
+    return {
+        "nutrition": dict(zip(table.columns, values.round(2).tolist())),
+        "probability_mass": coverage,
+        "classes": len(predictions),
+    }
+
+def predict_image_content(image_source, top_k=1, expected=None):
+    """
+    Classify an image and look up nutrition for its best predictions
     
-    # Process image
-    top_prediction = process_image_file(
-        model=model, 
-        image_path=image_path, 
-    )
+    Args:
+        image_source: Encoded image bytes, an uploaded file or a path
+        top_k: Number of best classes to return, at most PREDICTION_TOP_K_MAX
+        expected: Also return nutrition weighted over the ranked classes,
+            defaults to the EXPECTED_NUTRITION setting
+        
+    Returns:
+        Dictionary with the top class, its confidence and nutrition, plus
+        the k best classes under "top_predictions" and, if asked for, the
+        probability-weighted nutrition under "expected_nutrition"
+    """
+    top_k = max(1, min(int(top_k), get_setting('PREDICTION_TOP_K_MAX')))
+    if expected is None:
+        expected = get_setting('EXPECTED_NUTRITION')
     
-    # Example prediction categories
+    server = get_model_server()
     
-    # Simulate prediction by randomly selecting a category
+    # Decode from memory at a reduced scale close to the model input size
+    image = decode_image(read_image_bytes(image_source), target_size=server.input_size())
     
-    return {
-        "class": top_prediction["class_name"],
-    "confidence": top_prediction["confidence"],
-    "nutrition": get_nutrition_by_dish(str(top_prediction["class_name"]))
-    }
\ No newline at end of file
+    # Re-uploads of the same photo are answered from the cache. The cache
+    # keeps the ranked classes only; nutrition is looked up fresh below.
+    cache = get_prediction_cache()
+    cached = None
+    if cache is not None:
+        cache_key = cache.key_for(image)
+        model_signature = server.signature()
+        cached = cache.get(cache_key, model_signature)
+    
+    if cached is not None:
+        model_version, predictions = cached
+    else:
+        # Run inference on the version picked by the traffic split, batched
+        # with other requests
+        model_version, result = server.predict(image)
+        predictions = rank_predictions(result, get_setting('PREDICTION_TOP_K_MAX'))
+        if cache is not None:
+            cache.put(cache_key, model_signature, (model_version, predictions))
+    
+    top_predictions = [
+        {
+            "class": prediction["class_name"],
+            "confidence": prediction["confidence"],
+            "nutrition": get_nutrition_by_dish(str(prediction["class_name"])),
+        }
+        for prediction in predictions[:top_k]
+    ]
+    
+    response = {
+        "class": top_predictions[0]["class"],
+        "confidence": top_predictions[0]["confidence"],
+        "nutrition": top_predictions[0]["nutrition"],
+        "top_predictions": top_predictions,
+        "model_version": model_version,
+    }
+    if expected:
+        response["expected_nutrition"] = expected_nutrition(server.class_names(model_version), predictions)
+    
+    return response
\ No newline at end of file
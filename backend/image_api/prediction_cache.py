@@ -0,0 +1,143 @@
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .lazy import cv2, np
+
+MODE_EXACT = 'exact'
+MODE_PERCEPTUAL = 'perceptual'
+
+
+def content_hash(image):
+    """
+    Hash the decoded pixels of an image
+
+    Args:
+        image: Decoded image (numpy array)
+
+    Returns:
+        Hex digest identifying the exact pixel content
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def difference_hash(image, hash_size=8):
+    """
+    Perceptual difference hash (dHash) of an image
+
+    The image is shrunk to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right
+    neighbour, so re-encoding, resizing or small edits flip only a few bits.
+
+    Args:
+        image: Decoded BGR image (numpy array)
+        hash_size: Side of the hash grid
+
+    Returns:
+        Integer with hash_size * hash_size bits
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results keyed on image content
+
+    In exact mode the key is a hash of the decoded pixels. In perceptual mode
+    it is a dHash and a lookup also matches stored hashes within
+    max_distance differing bits, so near-identical photos share an entry.
+    Entries are tied to the model they were computed with and the cache is
+    emptied as soon as a different model signature is seen.
+    """
+
+    def __init__(self, max_entries=1024, mode=MODE_EXACT, max_distance=4):
+        if mode not in (MODE_EXACT, MODE_PERCEPTUAL):
+            raise ValueError(f"Unknown prediction cache mode '{mode}'")
+        self.max_entries = max_entries
+        self.mode = mode
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._model_signature = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key_for(self, image):
+        if self.mode == MODE_PERCEPTUAL:
+            return difference_hash(image)
+        return content_hash(image)
+
+    def _check_model(self, model_signature):
+        if model_signature != self._model_signature:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model_signature = model_signature
+
+    def _find(self, key):
+        if key in self._entries:
+            return key
+        if self.mode == MODE_PERCEPTUAL:
+            for stored_key in reversed(self._entries):
+                if (stored_key ^ key).bit_count() <= self.max_distance:
+                    return stored_key
+        return None
+
+    def get(self, key, model_signature):
+        """
+        Look up a cached result
+
+        Args:
+            key: Key from key_for()
+            model_signature: Identifies the model weights in use
+
+        Returns:
+            Copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            self._check_model(model_signature)
+            found = self._find(key)
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(found)
+            self.hits += 1
+            value = self._entries[found]
+        return copy.deepcopy(value)
+
+    def put(self, key, model_signature, value):
+        """Store a result computed with the given model"""
+        with self._lock:
+            self._check_model(model_signature)
+            self._entries[key] = copy.deepcopy(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'mode': self.mode,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -1,27 +1,21 @@
-import csv
-import json
+from .nutrition import NAME_COLUMN, get_nutrition_table
 
-def get_row_as_json(search_value, csv_file_path=r"backend\image_api\nutrient_values.csv",search_column="dish_name"):
+def get_row_as_json(search_value, csv_file_path=None, search_column=NAME_COLUMN):
+    """
+    Return the nutrient row of a dish, or None if it is not in the catalog
+
+    Lookups go through the shared in-memory nutrition table instead of
+    re-reading and scanning the CSV on every call. Only the dish_name
+    column is indexed. Without csv_file_path the configured catalog is used.
+    """
+    if search_column != NAME_COLUMN:
+        return None
     try:
-        with open(csv_file_path, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            # Check if the search column exists in the CSV headers
-            if search_column not in reader.fieldnames:
-                return None
-            
-            # Search for the row
-            for row in reader:
-                if row[search_column] == search_value:
-                    return row
-            
-            # If no matching row is found
-            return None
-                
+        return get_nutrition_table(csv_file_path).get(search_value)
     except Exception as e:
         print(f"Error: {e}")
         return None
 
 # Example usage:
-# result = get_row_as_json('data.csv', 'name', 'John')
-# json_string = json.dumps(result, indent=4)  # Convert to JSON string if needed
\ No newline at end of file
+# result = get_row_as_json('butter_chicken')
+# json_string = json.dumps(result, indent=4)  # Convert to JSON string if needed
@@ -1,22 +1,124 @@
+import math
+
+from django.urls import reverse
 from rest_framework import serializers
+from .conf import get_setting
+from .nutrition import get_nutrition_table
+from .thumbnails import derivative_name, thumbnail_sizes, thumbnail_storage
 from .models import ImageUpload, PredictionFeedback
 
 class ImageUploadSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = ImageUpload
-        fields = ['id', 'image', 'image_url', 'timestamp', 'prediction', 'prediction_id']
-        read_only_fields = ['timestamp', 'prediction', 'prediction_id', 'image_url']
+        fields = ['id', 'image', 'image_url', 'thumbnails', 'timestamp', 'prediction', 'prediction_id', 'status', 'original_bytes', 'stored_bytes']
+        read_only_fields = ['timestamp', 'prediction', 'prediction_id', 'image_url', 'thumbnails', 'status', 'original_bytes', 'stored_bytes']
+    
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        if not obj.ingested:
+            data['image'] = data['image_url']
+        return data
     
     def get_image_url(self, obj):
+        """
+        URL of the stored image, or of the endpoint redirecting to it until
+        the upload is re-encoded, as the original file is deleted then
+        """
+        request = self.context.get('request')
+        if not obj.image or not request:
+            return None
+        if not obj.ingested:
+            return request.build_absolute_uri(reverse('image-file', kwargs={'prediction_id': obj.prediction_id}))
+        return request.build_absolute_uri(obj.image.url)
+    
+    def get_thumbnails(self, obj):
+        """
+        URL of every thumbnail size: the file itself once generated,
+        otherwise the endpoint that schedules it and redirects there once
+        it exists. Generated sizes are recorded on the upload, so no
+        storage access is needed.
+        """
         request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url') and request:
-            return request.build_absolute_uri(obj.image.url)
-        return None
+        if not obj.image or not request:
+            return None
+        storage = thumbnail_storage()
+        urls = {}
+        for size in thumbnail_sizes():
+            if size in obj.available_thumbnails and obj.ingested:
+                url = storage.url(derivative_name(obj.image.name, size))
+            else:
+                url = reverse('image-thumbnail', kwargs={'prediction_id': obj.prediction_id, 'size': size})
+            urls[size] = request.build_absolute_uri(url)
+        return urls
+
+class ImageUploadStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImageUpload
+        fields = ['prediction_id', 'status', 'prediction', 'prediction_detail', 'error', 'timestamp']
+        read_only_fields = fields
 
 class PredictionFeedbackSerializer(serializers.ModelSerializer):
     class Meta:
         model = PredictionFeedback
         fields = ['id', 'feedback_data', 'timestamp']
-        read_only_fields = ['timestamp']
\ No newline at end of file
+        read_only_fields = ['timestamp']
+
+class BulkNutritionSerializer(serializers.Serializer):
+    """
+    A meal as a list of portions, each {"dish_name": ..., "grams": ...} or
+    a [dish_name, grams] pair
+    """
+    items = serializers.ListField(allow_empty=False)
+    
+    def validate_items(self, items):
+        max_items = get_setting('BULK_NUTRITION_MAX_ITEMS')
+        if len(items) > max_items:
+            raise serializers.ValidationError(f"At most {max_items} items per request.")
+        
+        dish_names, grams = [], []
+        for position, item in enumerate(items):
+            if isinstance(item, dict):
+                name, weight = item.get('dish_name'), item.get('grams')
+            elif isinstance(item, (list, tuple)) and len(item) == 2:
+                name, weight = item
+            else:
+                raise serializers.ValidationError(f"Item {position} must be an object or a [dish_name, grams] pair.")
+            if not isinstance(name, str) or not name:
+                raise serializers.ValidationError(f"Item {position} needs a dish_name.")
+            try:
+                weight = float(weight)
+            except (TypeError, ValueError):
+                weight = math.nan
+            if not math.isfinite(weight) or weight <= 0:
+                raise serializers.ValidationError(f"Item {position} needs a positive number of grams.")
+            dish_names.append(name)
+            grams.append(weight)
+        return {'dish_names': dish_names, 'grams': grams}
+
+
+class DishRecommendationSerializer(serializers.Serializer):
+    """
+    Reference for recommendations: a dish, target nutrient values or both,
+    with nutrient columns the results must be lower or higher in
+    """
+    dish_name = serializers.CharField(required=False)
+    targets = serializers.DictField(child=serializers.FloatField(), required=False)
+    k = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    lower = serializers.ListField(child=serializers.CharField(), default=list)
+    higher = serializers.ListField(child=serializers.CharField(), default=list)
+    
+    def validate(self, attrs):
+        if not attrs.get('dish_name') and not attrs.get('targets'):
+            raise serializers.ValidationError("Give a dish_name, targets or both.")
+        
+        columns = get_nutrition_table().snapshot().columns
+        for field in ('targets', 'lower', 'higher'):
+            unknown = [column for column in attrs.get(field) or () if column not in columns]
+            if unknown:
+                raise serializers.ValidationError(
+                    {field: f"Unknown nutrient columns {unknown}, expected some of {list(columns)}."}
+                )
+        return attrs
@@ -0,0 +1,224 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+from .batching import BatchingInferenceEngine
+from .conf import get_setting
+from .model_registry import file_signature, registry
+from .lazy import np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION = 'default'
+
+
+class VersionStats:
+    """Rolling latency and shadow agreement counters for one model version"""
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.latencies = deque(maxlen=window)
+        self.shadow_runs = 0
+        self.shadow_agreements = 0
+        self.shadow_failures = 0
+        self.shadow_skipped = 0
+        self.shadow_latencies = deque(maxlen=window)
+
+    def as_dict(self):
+        def summary(values):
+            if not values:
+                return None
+            values = np.fromiter(values, dtype=float) * 1000
+            return {
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+            }
+
+        return {
+            'requests': self.requests,
+            'latency': summary(self.latencies),
+            'shadow_runs': self.shadow_runs,
+            'shadow_agreement_rate': self.shadow_agreements / self.shadow_runs if self.shadow_runs else None,
+            'shadow_failures': self.shadow_failures,
+            'shadow_skipped': self.shadow_skipped,
+            'shadow_latency': summary(self.shadow_latencies),
+        }
+
+
+class ModelServer:
+    """
+    Serves several named model versions side by side
+
+    Each request is routed to one version according to the traffic split.
+    Optionally a shadow version is run on a sample of requests in a
+    background thread; its answer is never returned to the user but its
+    latency and top-1 agreement with the served answer are recorded, so a
+    faster candidate can be promoted on evidence.
+    """
+
+    def __init__(self, versions, traffic_split=None, shadow_version=None, shadow_sample_rate=0.0,
+                 shadow_max_pending=16, batching=True, max_batch_size=8, max_wait_ms=5):
+        if not versions:
+            raise ValueError("At least one model version is required")
+        self.versions = {name: str(path) for name, path in versions.items()}
+        self.traffic_split = dict(traffic_split or {name: 1 for name in self.versions})
+        for name in list(self.traffic_split) + ([shadow_version] if shadow_version else []):
+            if name not in self.versions:
+                raise ValueError(f"Unknown model version '{name}'")
+        if not any(weight > 0 for weight in self.traffic_split.values()):
+            raise ValueError("The traffic split must send traffic to at least one version")
+
+        self.shadow_version = shadow_version
+        self.shadow_sample_rate = shadow_sample_rate
+        self.shadow_max_pending = shadow_max_pending
+        self.batching = batching
+        self._engines = {
+            name: BatchingInferenceEngine(path, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+            for name, path in self.versions.items()
+        }
+        self._stats = {name: VersionStats() for name in self.versions}
+        self._stats_lock = threading.Lock()
+        self._shadow_executor = None
+        self._shadow_pending = 0
+
+    def active_versions(self):
+        """Versions that receive traffic or shadow requests"""
+        active = [name for name, weight in self.traffic_split.items() if weight > 0]
+        if self.shadow_version and self.shadow_version not in active:
+            active.append(self.shadow_version)
+        return active
+
+    def choose_version(self):
+        """Pick the version for a request according to the traffic split"""
+        names = list(self.traffic_split)
+        return random.choices(names, weights=[self.traffic_split[name] for name in names])[0]
+
+    def signature(self):
+        """File state of every active version, used to invalidate cached predictions"""
+        return tuple((name, file_signature(self.versions[name])) for name in self.active_versions())
+
+    def input_size(self):
+        """Largest input size among the active versions"""
+        sizes = []
+        for name in self.active_versions():
+            imgsz = registry.get_model(self.versions[name]).overrides.get('imgsz') or 640
+            sizes.append(min(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz))
+        return max(sizes)
+
+    def class_names(self, version):
+        """Class names of a version in class id order"""
+        names = registry.get_model(self.versions[version]).names
+        return tuple(names[class_id] for class_id in range(len(names)))
+
+    def _infer(self, version, image):
+        if self.batching:
+            return self._engines[version].predict(image)
+        with registry.use_model(self.versions[version]) as model:
+            return model.predict(image, verbose=False)[0]
+
+    def predict(self, image, version=None):
+        """
+        Run one image through a version, chosen by the traffic split if not given
+
+        Args:
+            image: Decoded image (numpy array)
+            version: Name of the version to use
+
+        Returns:
+            Tuple of (version name, ultralytics Results object)
+        """
+        version = version or self.choose_version()
+        started = time.perf_counter()
+        result = self._infer(version, image)
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            stats = self._stats[version]
+            stats.requests += 1
+            stats.latencies.append(elapsed)
+
+        if self.shadow_version and self.shadow_version != version and random.random() < self.shadow_sample_rate:
+            self._submit_shadow(image, int(result.probs.top1), result.names)
+        return version, result
+
+    def _submit_shadow(self, image, served_top1, served_names):
+        with self._stats_lock:
+            if self._shadow_pending >= self.shadow_max_pending:
+                # Never let shadow work pile up behind live traffic
+                self._stats[self.shadow_version].shadow_skipped += 1
+                return
+            self._shadow_pending += 1
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-model')
+        self._shadow_executor.submit(self._run_shadow, image, served_names[served_top1])
+
+    def _run_shadow(self, image, served_class):
+        try:
+            started = time.perf_counter()
+            result = self._infer(self.shadow_version, image)
+            elapsed = time.perf_counter() - started
+            agrees = result.names[int(result.probs.top1)] == served_class
+            with self._stats_lock:
+                stats = self._stats[self.shadow_version]
+                stats.shadow_runs += 1
+                stats.shadow_agreements += int(agrees)
+                stats.shadow_latencies.append(elapsed)
+        except Exception:
+            logger.exception("Shadow inference with %s failed", self.shadow_version)
+            with self._stats_lock:
+                self._stats[self.shadow_version].shadow_failures += 1
+        finally:
+            with self._stats_lock:
+                self._shadow_pending -= 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'traffic_split': self.traffic_split,
+                'shadow_version': self.shadow_version,
+                'shadow_sample_rate': self.shadow_sample_rate,
+                'versions': {
+                    name: {
+                        'weights': self.versions[name],
+                        **self._stats[name].as_dict(),
+                        'batching': self._engines[name].stats(),
+                    }
+                    for name in self.versions
+                },
+            }
+
+
+def configured_versions(default_path):
+    """
+    Model versions from IMAGE_API['MODEL_VERSIONS'], relative to BASE_DIR
+
+    Without any configured versions the served backend's weights are the
+    single 'default' version.
+    """
+    versions = get_setting('MODEL_VERSIONS')
+    if not versions:
+        return {DEFAULT_VERSION: default_path}
+    return {
+        name: path if Path(path).is_absolute() else Path(settings.BASE_DIR) / path
+        for name, path in versions.items()
+    }
+
+
+def build_model_server(default_path):
+    """Create a ModelServer from the IMAGE_API settings"""
+    versions = configured_versions(default_path)
+    return ModelServer(
+        versions,
+        traffic_split=get_setting('TRAFFIC_SPLIT') or None,
+        shadow_version=get_setting('SHADOW_MODEL'),
+        shadow_sample_rate=get_setting('SHADOW_SAMPLE_RATE'),
+        batching=get_setting('BATCHING_ENABLED'),
+        max_batch_size=get_setting('BATCH_MAX_SIZE'),
+        max_wait_ms=get_setting('BATCH_MAX_WAIT_MS'),
+    )
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.core.files import File
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Dish, ImageUpload
+from .storage import ContentAddressedStorage, acquire_blob, release_blob
+
+UPLOAD_FILE_FIELDS = ('image', 'original_image')
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+def invalidate_dish_catalog(sender, **kwargs):
+    # Only after commit, otherwise another worker could cache the old rows
+    # under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+def _stored_name(instance, field_name):
+    """Name of the file a field holds, None if empty or not loaded"""
+    value = instance.__dict__.get(field_name)
+    name = getattr(value, 'name', value)
+    return name or None
+
+
+@receiver(post_init, sender=ImageUpload)
+def remember_upload_files(sender, instance, **kwargs):
+    # Read from __dict__, so deferred fields are not fetched
+    instance._stored_files = {
+        field_name: _stored_name(instance, field_name) for field_name in UPLOAD_FILE_FIELDS
+        if field_name in instance.__dict__
+    }
+
+
+@receiver(pre_save, sender=ImageUpload)
+def remember_new_upload_contents(sender, instance, **kwargs):
+    # Files assigned since the row was loaded are written by the save that
+    # follows, keep their contents for acquire_blob()
+    instance._new_file_contents = {}
+    for field_name in UPLOAD_FILE_FIELDS:
+        value = instance.__dict__.get(field_name)
+        if isinstance(value, FieldFile):
+            if value._committed:
+                continue
+            value = value.file
+        if isinstance(value, File):
+            instance._new_file_contents[field_name] = value
+
+
+@receiver(post_save, sender=ImageUpload)
+def reference_upload_files(sender, instance, created, update_fields=None, **kwargs):
+    # References are taken once the row exists, in its transaction, and the
+    # blob a field pointed at before is released
+    contents = instance.__dict__.pop('_new_file_contents', {})
+    for field_name in UPLOAD_FILE_FIELDS:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        if not created and field_name not in instance._stored_files:
+            # Deferred when the row was loaded, the previous name is unknown
+            continue
+        file = getattr(instance, field_name)
+        if not isinstance(file.storage, ContentAddressedStorage):
+            continue
+        previous = None if created else instance._stored_files.get(field_name)
+        current = _stored_name(instance, field_name)
+        if current == previous:
+            continue
+        if current:
+            acquire_blob(file.storage, current, contents.get(field_name))
+        if previous:
+            release_blob(file.storage, previous)
+        instance._stored_files[field_name] = current
+
+
+@receiver(post_delete, sender=ImageUpload)
+def release_upload_files(sender, instance, **kwargs):
+    # Stored blobs are shared between uploads, so a file is only deleted
+    # together with its last reference
+    for field_name in UPLOAD_FILE_FIELDS:
+        file = getattr(instance, field_name)
+        if file and isinstance(file.storage, ContentAddressedStorage):
+            release_blob(file.storage, file.name)
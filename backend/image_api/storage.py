@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(content):
+    """SHA-256 hex digest of a file's bytes, leaving it rewound"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    """
+    Storage name of a blob: the directory chosen by upload_to, a two
+    character fan-out directory and the digest, keeping the extension
+
+    e.g. images/uuid.webp -> images/3f/3fa1...c2.webp
+    """
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], f"{digest}{extension}")
+
+
+def acquire_blob(storage, name, content=None):
+    """
+    Count one more reference to a stored blob
+
+    Called from post_save when a row starts pointing at the blob (see
+    signals.py), inside the row's transaction, so a failed insert never
+    leaves a reference behind. content is the file just saved under the
+    name, if any: it gives the size without touching the disk, and writes
+    the blob again if a release deleted it after save() found it present.
+    Files that were never stored (and were not just saved) are not tracked.
+    """
+    from .models import MediaBlob
+
+    if MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+        return
+    if content is not None:
+        size = content.size
+    else:
+        try:
+            size = storage.size(name)
+        except FileNotFoundError:
+            logger.info("Not tracking %s, the file does not exist", name)
+            return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=size, ref_count=1)
+    except IntegrityError:
+        # Created by a concurrent upload of the same bytes
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+        return
+    # A release deleting the file holds the name until it is gone (see
+    # release_blob), so once the row exists the check below is reliable
+    if content is not None and not storage.exists(name):
+        storage._save(name, content)
+
+
+def release_blob(storage, name):
+    """
+    Drop one reference to a stored blob, deleting the file with the last one
+
+    The file is removed after the surrounding transaction commits, and only
+    if no new reference was taken in the meantime. While deleting, the name
+    is claimed with a placeholder row, so an acquire of the same bytes waits
+    for the delete and then writes the file again.
+    """
+    from .models import MediaBlob
+
+    with transaction.atomic():
+        if not MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1):
+            # Not tracked (stored before deduplication), leave the file alone
+            return
+        deleted, _ = MediaBlob.objects.filter(name=name, ref_count__lte=0).delete()
+
+    if deleted:
+        def delete_file():
+            from .thumbnails import delete_derivatives
+
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        claim = MediaBlob.objects.create(name=name, size=0, ref_count=0)
+                except IntegrityError:
+                    # Referenced again in the meantime
+                    return
+                storage.delete(name)
+                delete_derivatives(name)
+                claim.delete()
+        transaction.on_commit(delete_file)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that stores identical files once
+
+    Files are named after the SHA-256 of their bytes, so uploading the same
+    image again reuses the stored blob instead of writing a copy. Each blob
+    has a MediaBlob row counting the model fields that point at it, taken
+    when a row referencing it is saved; the file is deleted when the last
+    of them is deleted or repointed (see signals.py).
+    """
+
+    def save(self, name, content, max_length=None):
+        # An existing blob is not written again; should its last reference
+        # be released before this one is taken, acquire_blob() rewrites it
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = content_name(name, content_digest(content))
+        if not self.exists(name):
+            self._save(name, content)
+        return name
+
+    def _save(self, name, content):
+        # Written to a temporary file and renamed into place, so a blob is
+        # never seen half written and concurrent writes of it are harmless
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(temporary_path, self.file_permissions_mode or 0o644)
+            os.replace(temporary_path, full_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+        return name
+
+
+_storage = ContentAddressedStorage()
+
+
+def image_storage():
+    """Storage of uploaded images, referenced by the ImageUpload file fields"""
+    return _storage
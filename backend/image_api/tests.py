@@ -1,3 +1,231 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from .ingest import upload_fields
+from .jobs import JobPool
+from .models import ImageUpload, MediaBlob
+from .serializers import ImageUploadSerializer
+from .storage import acquire_blob, image_storage
+
+# Runs in a fresh interpreter, so nothing imported by the test runner leaks in
+STARTUP_SCRIPT = """
+import json, os, resource, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+started = time.perf_counter()
+import django
+django.setup()
+if sys.argv[1:] != ['baseline']:
+    from django.urls import resolve
+    resolve('/image/upload/')
+    import image_api.views
+seconds = time.perf_counter() - started
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'seconds': seconds,
+    'rss_mb': peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024,
+    'modules': sorted(sys.modules),
+}))
+"""
+
+
+class StartupCostTests(SimpleTestCase):
+    """Loading Django and the URLconf must not pull in the inference stack"""
+
+    HEAVY_MODULES = ('ultralytics', 'torch', 'cv2', 'numpy', 'PIL', 'pandas', 'onnxruntime')
+    MAX_SECONDS = 3.0
+    # Memory the URLconf may add on top of a bare django.setup() measured in
+    # the same run, so the budget does not depend on the interpreter or
+    # platform. The views and DRF cost ~15MB, numpy would add ~11MB and
+    # OpenCV ~40MB
+    MAX_EXTRA_RSS_MB = 22
+
+    @classmethod
+    def run_startup(cls, *args):
+        output = subprocess.check_output(
+            [sys.executable, '-c', STARTUP_SCRIPT, *args], cwd=settings.BASE_DIR, timeout=60,
+        )
+        return json.loads(output.decode().strip().splitlines()[-1])
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.startup = cls.run_startup()
+        cls.baseline = cls.run_startup('baseline')
+
+    def test_heavy_modules_not_imported(self):
+        loaded = {name.split('.')[0] for name in self.startup['modules']}
+        self.assertEqual(sorted(loaded.intersection(self.HEAVY_MODULES)), [])
+
+    def test_startup_time(self):
+        self.assertLess(self.startup['seconds'], self.MAX_SECONDS)
+
+    def test_startup_memory(self):
+        self.assertLess(self.startup['rss_mb'] - self.baseline['rss_mb'], self.MAX_EXTRA_RSS_MB)
+
+
+class JobQueueTests(TestCase):
+    """Async uploads must neither pile up in memory nor wait forever"""
+
+    def test_pool_turns_jobs_away_when_full(self):
+        pool = JobPool('test', max_workers=1, max_queued=1)
+        release = threading.Event()
+        self.assertTrue(pool.submit(release.wait))
+        self.assertTrue(pool.submit(release.wait))
+        self.assertFalse(pool.submit(release.wait))
+        self.assertFalse(pool.has_capacity())
+        release.set()
+        pool._executor.shutdown(wait=True)
+        self.assertTrue(pool.has_capacity())
+
+    def test_resume_predictions_fails_stale_uploads(self):
+        user = User.objects.create(username='uploader')
+        ImageUpload.objects.bulk_create([
+            ImageUpload(user=user, image='images/a.jpg', status=status)
+            for status in (ImageUpload.STATUS_PENDING, ImageUpload.STATUS_PROCESSING, ImageUpload.STATUS_COMPLETED)
+        ])
+        # auto_now_add ignores the value given on create
+        ImageUpload.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+        recent = ImageUpload.objects.bulk_create([ImageUpload(user=user, image='images/b.jpg')])[0]
+
+        call_command('resume_predictions', '--fail', stdout=io.StringIO())
+
+        statuses = sorted(ImageUpload.objects.exclude(pk=recent.pk).values_list('status', flat=True))
+        self.assertEqual(statuses, ['completed', 'failed', 'failed'])
+        self.assertEqual(ImageUpload.objects.get(pk=recent.pk).status, ImageUpload.STATUS_PENDING)
+
+
+def jpeg_bytes(size=(2400, 1800), color=(200, 120, 40)):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'JPEG', quality=95)
+    return output.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """Stores files in a temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create(username='uploader')
+
+
+class IngestTests(MediaTestCase):
+    """Clients must never be handed the URL of a file about to be deleted"""
+
+    def test_uploads_link_a_stable_url_until_reencoded(self):
+        upload = ImageUpload.objects.create(user=self.user, **upload_fields(jpeg_bytes(), 'meal.jpg'))
+        original = upload.image.name
+        request = APIRequestFactory().get('/')
+        stable_url = request.build_absolute_uri(reverse('image-file', kwargs={'prediction_id': upload.prediction_id}))
+
+        data = ImageUploadSerializer(upload, context={'request': request}).data
+        self.assertEqual((data['image'], data['image_url']), (stable_url, stable_url))
+        self.assertEqual(self.client.get(stable_url).url, image_storage().url(original))
+
+        # A job lost to a restart is picked up by the command
+        ImageUpload.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reencode_uploads', stdout=io.StringIO())
+
+        upload.refresh_from_db()
+        self.assertTrue(upload.ingested)
+        self.assertTrue(upload.image.name.endswith('.webp'))
+        self.assertLess(upload.stored_bytes, upload.original_bytes)
+        self.assertFalse(image_storage().exists(original))
+        self.assertFalse(MediaBlob.objects.filter(name=original).exists())
+        self.assertEqual(self.client.get(stable_url).url, image_storage().url(upload.image.name))
+        data = ImageUploadSerializer(upload, context={'request': request}).data
+        self.assertEqual(data['image_url'], request.build_absolute_uri(upload.image.url))
+
+
+class BlobReferenceTests(MediaTestCase):
+    """Identical uploads share a file, deleted with its last reference"""
+
+    def upload(self, data=None):
+        return ImageUpload.objects.create(user=self.user, image=ContentFile(data or jpeg_bytes((64, 48)), name='meal.jpg'))
+
+    def references(self, name):
+        return MediaBlob.objects.filter(name=name).values_list('ref_count', flat=True).first()
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.upload(), self.upload()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+        self.assertEqual(MediaBlob.objects.get().size, image_storage().size(first.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.references(second.image.name), 1)
+        self.assertTrue(image_storage().exists(second.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertIsNone(self.references(second.image.name))
+        self.assertFalse(image_storage().exists(second.image.name))
+
+    def test_cascade_delete_releases_blobs(self):
+        name = self.upload().image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(image_storage().exists(name))
+
+    def test_repointing_releases_previous_blob(self):
+        upload = self.upload()
+        previous = upload.image.name
+        upload = ImageUpload.objects.get(pk=upload.pk)
+        upload.image = ContentFile(jpeg_bytes((64, 48), color=(0, 0, 0)), name='other.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            upload.save()
+        self.assertNotEqual(upload.image.name, previous)
+        self.assertEqual(self.references(upload.image.name), 1)
+        self.assertIsNone(self.references(previous))
+        self.assertFalse(image_storage().exists(previous))
+
+    def test_release_keeps_file_referenced_again(self):
+        first = self.upload()
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        # The same bytes are uploaded before the file deletion runs
+        second = self.upload()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.references(second.image.name), 1)
+        self.assertTrue(image_storage().exists(second.image.name))
+
+    def test_acquire_rewrites_blob_deleted_meanwhile(self):
+        content = ContentFile(jpeg_bytes((64, 48)), name='meal.jpg')
+        name = image_storage().save('images/meal.jpg', content)
+        # Deleted by a release after save() found the file present
+        image_storage().delete(name)
+        acquire_blob(image_storage(), name, content)
+        self.assertTrue(image_storage().exists(name))
+        self.assertEqual(self.references(name), 1)
+
+    def test_missing_file_is_not_tracked(self):
+        # e.g. the rows benchmark_inference creates without writing a file
+        with self.assertLogs('image_api.storage', 'INFO'):
+            upload = ImageUpload.objects.create(user=self.user, image='images/benchmark.jpg')
+        self.assertFalse(MediaBlob.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            upload.delete()
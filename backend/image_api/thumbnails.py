@@ -0,0 +1,104 @@
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from .conf import get_setting
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+
+# Derivatives have deterministic names, so regenerating one overwrites it
+_storage = FileSystemStorage(allow_overwrite=True)
+
+
+def thumbnail_storage():
+    return _storage
+
+
+def thumbnail_sizes():
+    """Configured derivative sizes, name -> longest side in pixels"""
+    return get_setting('THUMBNAIL_SIZES')
+
+
+def derivative_name(image_name, size):
+    """
+    Storage name of a derivative of a stored image
+
+    The whole image name is kept, directories included, e.g.
+    images/3f/3fa1...c2.webp -> thumbnails/small/images/3f/3fa1...c2.webp,
+    since blobs in different directories can share a file stem.
+    """
+    stem = posixpath.splitext(image_name)[0]
+    extension = 'jpg' if get_setting('THUMBNAIL_FORMAT') == 'jpeg' else get_setting('THUMBNAIL_FORMAT')
+    return posixpath.join(THUMBNAIL_DIR, size, f"{stem}.{extension}")
+
+
+def derivative_exists(image_name, size):
+    return thumbnail_storage().exists(derivative_name(image_name, size))
+
+
+def make_derivatives(image_name, sizes=None, force=False):
+    """
+    Generate the thumbnails of a stored image that do not exist yet
+
+    The image is decoded once, at a reduced JPEG scale when possible, and
+    the sizes are produced largest first, each one shrunk from the last.
+    Afterwards the available sizes are recorded on every upload of the
+    image, so listing uploads never has to probe the storage.
+
+    Args:
+        image_name: Storage name of the image
+        sizes: Names of the sizes to generate, default all configured
+        force: Regenerate derivatives that already exist
+
+    Returns:
+        List of the sizes that were written
+    """
+    from PIL import Image, ImageOps
+
+    configured = thumbnail_sizes()
+    sizes = [size for size in (sizes or configured) if force or not derivative_exists(image_name, size)]
+    if not sizes:
+        record_derivatives(image_name)
+        return []
+
+    image_format = get_setting('THUMBNAIL_FORMAT')
+    pil_format = 'JPEG' if image_format == 'jpeg' else image_format.upper()
+    storage = thumbnail_storage()
+    with image_storage().open(image_name, 'rb') as f:
+        with Image.open(f) as source:
+            largest = max(configured[size] for size in sizes)
+            source.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(source)
+            if image.mode not in ('RGB', 'RGBA') or (image.mode == 'RGBA' and pil_format == 'JPEG'):
+                image = image.convert('RGB')
+
+            for size in sorted(sizes, key=lambda name: configured[name], reverse=True):
+                side = configured[size]
+                image.thumbnail((side, side), Image.LANCZOS)
+                output = io.BytesIO()
+                image.save(output, pil_format, quality=get_setting('THUMBNAIL_QUALITY'))
+                storage.save(derivative_name(image_name, size), ContentFile(output.getvalue()))
+    record_derivatives(image_name)
+    return sizes
+
+
+def record_derivatives(image_name):
+    """Store which thumbnails of an image exist on the uploads showing it"""
+    from .models import ImageUpload
+
+    available = [size for size in thumbnail_sizes() if derivative_exists(image_name, size)]
+    ImageUpload.objects.filter(image=image_name).update(available_thumbnails=available)
+    return available
+
+
+def delete_derivatives(image_name):
+    """Remove every derivative of a stored image"""
+    storage = thumbnail_storage()
+    for size in thumbnail_sizes():
+        storage.delete(derivative_name(image_name, size))
@@ -1,10 +1,18 @@
 # data_api/urls.py
 
 from django.urls import path
-from .views import ImageUploadView, PredictionFeedbackView, UserImageListView
+from .views import ImageUploadView, ImageUploadStatusView, PredictionFeedbackView, UserImageListView, ModelStatsView, ReadinessView, DishAutocompleteView, ImageFileView, ThumbnailView, BulkNutritionView, DishRecommendationView
 
 urlpatterns = [
     path('upload/', ImageUploadView.as_view(), name='image-upload'),
+    path('status/<uuid:prediction_id>/', ImageUploadStatusView.as_view(), name='image-status'),
     path('feedback/', PredictionFeedbackView.as_view(), name='prediction-feedback'),
+    path('dishes/autocomplete/', DishAutocompleteView.as_view(), name='dish-autocomplete'),
+    path('dishes/recommend/', DishRecommendationView.as_view(), name='dish-recommend'),
+    path('nutrition/bulk/', BulkNutritionView.as_view(), name='nutrition-bulk'),
+    path('images/<uuid:prediction_id>/', ImageFileView.as_view(), name='image-file'),
+    path('thumbnails/<uuid:prediction_id>/<str:size>/', ThumbnailView.as_view(), name='image-thumbnail'),
     path('my-images/', UserImageListView.as_view(), name='user-image-list'),
+    path('model/stats/', ModelStatsView.as_view(), name='model-stats'),
+    path('ready/', ReadinessView.as_view(), name='image-ready'),
 ]
\ No newline at end of file
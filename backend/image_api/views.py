@@ -1,10 +1,24 @@
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import redirect
+from django.urls import reverse
 from .models import ImageUpload, PredictionFeedback
-from .serializers import ImageUploadSerializer, PredictionFeedbackSerializer
-from .prediction import predict_image_content, get_nutrition_by_dish
-from .searchNutrients import get_row_as_json
+from .serializers import ImageUploadSerializer, ImageUploadStatusSerializer, PredictionFeedbackSerializer, BulkNutritionSerializer, DishRecommendationSerializer
+from .prediction import predict_image_content, get_nutrition_by_dish, get_model_server, get_prediction_cache, read_image_bytes
+from .model_registry import registry
+from .jobs import accepting_predictions, enqueue_derivatives, enqueue_ingest, enqueue_prediction
+from .ingest import upload_fields
+from .thumbnails import derivative_name, thumbnail_sizes, thumbnail_storage
+from .conf import get_setting
+from .dish_search import get_dish_index
+from .nutrition import NAME_COLUMN, get_nutrition_table
+from .recommendations import recommend
+from . import warmup
 
 class ImageUploadView(generics.CreateAPIView):
     """API endpoint for uploading and processing images"""
@@ -15,19 +29,46 @@ class ImageUploadView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        top_k = self.get_top_k(request)
+        expected = self.get_flag(request, 'expected')
         
-        # Save the image upload with the authenticated user
-        instance = serializer.save(user=request.user)
+        # Inference works on the upload buffer, never on the stored copy
+        upload = serializer.validated_data['image']
+        image_data = read_image_bytes(upload)
+        # Stored as received; the copy is downscaled in the worker pool
+        stored_fields = upload_fields(image_data, upload.name)
         
-        # Get the path to the saved image
-        image_path = instance.image.path
+        if self.get_flag(request, 'async', get_setting('ASYNC_UPLOADS')):
+            if not accepting_predictions():
+                return Response(
+                    {'detail': 'Too many uploads are waiting for prediction.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'},
+                )
+            # Save the image upload and let the worker pool predict from memory
+            with transaction.atomic():
+                instance = serializer.save(user=request.user, **stored_fields)
+            self.schedule_processing(instance, image_data)
+            enqueue_prediction(instance.pk, top_k=top_k, image_data=image_data, expected=expected)
+            response_data = self.get_serializer(instance).data
+            response_data['status_url'] = request.build_absolute_uri(
+                reverse('image-status', kwargs={'prediction_id': instance.prediction_id})
+            )
+            return Response(response_data, status=status.HTTP_202_ACCEPTED)
         
         # Use the prediction service to analyze the image
-        prediction_result = predict_image_content(image_path)
+        prediction_result = predict_image_content(image_data, top_k=top_k, expected=expected)
         
-        # Update the instance with the prediction
-        instance.prediction = prediction_result['class']
-        instance.save()
+        # Persist the original together with its prediction in one write,
+        # and the blob references with the row (see signals.py)
+        with transaction.atomic():
+            instance = serializer.save(
+                user=request.user,
+                **stored_fields,
+                prediction=prediction_result['class'],
+                prediction_detail=prediction_result,
+                status=ImageUpload.STATUS_COMPLETED,
+            )
+        self.schedule_processing(instance, image_data)
         
         # Return the updated instance data
         response_serializer = self.get_serializer(instance)
@@ -37,6 +78,31 @@ class ImageUploadView(generics.CreateAPIView):
         })
         
         return Response(response_data, status=status.HTTP_201_CREATED)
+    
+    def get_top_k(self, request):
+        """Number of candidate classes the client asked for with top_k"""
+        top_k = request.query_params.get('top_k', request.data.get('top_k', 1))
+        try:
+            return max(1, int(top_k))
+        except (TypeError, ValueError):
+            raise ValidationError({'top_k': 'Must be a positive integer.'})
+    
+    def schedule_processing(self, instance, image_data):
+        """Re-encode the stored copy and make thumbnails off the request path"""
+        if not instance.ingested:
+            enqueue_ingest(instance.pk, image_data)
+        elif get_setting('THUMBNAIL_EAGER'):
+            enqueue_derivatives(instance.image.name)
+    
+    def get_flag(self, request, name, default=None):
+        """
+        Boolean option passed in the query string or form, e.g. async=true
+        for a 202 response or expected=true for probability-weighted nutrition
+        """
+        requested = request.query_params.get(name, request.data.get(name))
+        if requested is None:
+            return default
+        return str(requested).lower() in ('1', 'true', 'yes')
 
 class PredictionFeedbackView(generics.CreateAPIView):
     """API endpoint for submitting feedback on predictions"""
@@ -51,13 +117,191 @@ class PredictionFeedbackView(generics.CreateAPIView):
         # Associate the feedback with the authenticated user
         instance = serializer.save(user=self.request.user)
         response_data = get_nutrition_by_dish(instance.feedback_data)
+        if 'error' not in response_data:
+            return Response(response_data, status=status.HTTP_201_CREATED)
+        
+        # Typed corrections rarely match the table exactly, so fall back to
+        # the closest dish name and offer suggestions when nothing is close
+        index = get_dish_index()
+        matched_dish = index.best_match(instance.feedback_data)
+        if matched_dish is not None:
+            response_data = get_nutrition_by_dish(matched_dish)
+            response_data['matched_dish'] = matched_dish
+        else:
+            response_data['suggestions'] = [name for name, _ in index.search(instance.feedback_data, limit=5)]
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
+class DishAutocompleteView(generics.GenericAPIView):
+    """API endpoint suggesting dish names for partial or misspelled input"""
+    permission_classes = [permissions.IsAuthenticated]
+    # The token alone identifies the user, so suggestions never touch the DB
+    authentication_classes = [JWTStatelessUserAuthentication]
+    
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(1, int(request.query_params.get('limit', 10))), 50)
+        except ValueError:
+            raise ValidationError({'limit': 'Must be a positive integer.'})
+        
+        results = get_dish_index().search(query, limit=limit)
+        return Response({
+            'query': query,
+            'results': [{'dish_name': name, 'score': round(score, 4)} for name, score in results],
+        })
+
+
+class BulkNutritionView(generics.GenericAPIView):
+    """API endpoint computing the nutrition of a whole meal of portions"""
+    serializer_class = BulkNutritionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [JWTStatelessUserAuthentication]
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dish_names = serializer.validated_data['items']['dish_names']
+        grams = serializer.validated_data['items']['grams']
+        
+        # Names missing from the table fall back to the closest dish
+        # One snapshot, so a concurrent reload cannot mix two table versions
+        table = get_nutrition_table().snapshot()
+        dish_index = get_dish_index()
+        resolved = [
+            name if name in table.index else dish_index.best_match(name)
+            for name in dish_names
+        ]
+        found, values, totals = table.portions(resolved, grams)
+        
+        items = []
+        for name, matched, weight, is_found, row in zip(dish_names, resolved, grams, found.tolist(), values.round(2).tolist()):
+            item = {NAME_COLUMN: name, 'grams': weight, 'found': is_found}
+            if is_found:
+                item['matched_dish'] = matched
+                # Nutrients missing from the CSV come through as null
+                item['nutrition'] = {column: value if value == value else None for column, value in zip(table.columns, row)}
+            items.append(item)
+        
+        return Response({
+            'items': items,
+            'totals': dict(zip(table.columns, totals.round(2).tolist())),
+            'missing': [name for name, is_found in zip(dish_names, found.tolist()) if not is_found],
+        })
+
+
+class DishRecommendationView(generics.GenericAPIView):
+    """API endpoint suggesting nutritionally similar dishes, e.g. with fewer fats"""
+    serializer_class = DishRecommendationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [JWTStatelessUserAuthentication]
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        dish_name = data.get('dish_name')
+        if dish_name:
+            matched_dish = dish_name if dish_name in get_nutrition_table().index else get_dish_index().best_match(dish_name)
+            if matched_dish is None:
+                return Response({'error': f"Dish '{dish_name}' not found."}, status=status.HTTP_404_NOT_FOUND)
+            dish_name = matched_dish
+        
+        results = recommend(
+            dish_name=dish_name,
+            targets=data.get('targets'),
+            k=data['k'],
+            lower=data['lower'],
+            higher=data['higher'],
+        )
+        return Response({'dish_name': dish_name, 'results': results})
+
+
+class ImageUploadStatusView(generics.RetrieveAPIView):
+    """API endpoint to poll the prediction of an upload by its prediction_id"""
+    serializer_class = ImageUploadStatusSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'prediction_id'
+    
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+
+class ImageFileView(generics.GenericAPIView):
+    """
+    API endpoint redirecting to the stored image of an upload
+    
+    The file behind an upload changes once when it is re-encoded, and the
+    original is deleted then, so responses link here until that happened.
+    Open like the media files themselves, as ThumbnailView.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def get(self, request, prediction_id):
+        upload = ImageUpload.objects.filter(prediction_id=prediction_id).only('image').first()
+        if upload is None or not upload.image:
+            raise Http404("No such image")
+        return redirect(upload.image.url)
+
+
+class ThumbnailView(generics.GenericAPIView):
+    """
+    API endpoint redirecting to a thumbnail, or scheduling it if missing
+    
+    Open like the media files themselves, so it works as an <img> source;
+    the prediction_id is as hard to guess as the stored file name. Missing
+    thumbnails are generated in the worker pool, never in the request, and
+    the client is told to retry with a 202.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def get(self, request, prediction_id, size):
+        if size not in thumbnail_sizes():
+            raise Http404("Unknown thumbnail size")
+        upload = ImageUpload.objects.filter(prediction_id=prediction_id).only('image', 'ingested', 'available_thumbnails').first()
+        if upload is None or not upload.image:
+            raise Http404("No such image")
+        
+        if size in upload.available_thumbnails:
+            return redirect(thumbnail_storage().url(derivative_name(upload.image.name, size)))
+        if upload.ingested:
+            # Otherwise they are made from the re-encoded image once stored
+            enqueue_derivatives(upload.image.name)
+        return Response({'detail': 'Thumbnail is being generated.'}, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '2'})
+
+
 class UserImageListView(generics.ListAPIView):
     """API endpoint to fetch all images uploaded by the current user"""
     serializer_class = ImageUploadSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return ImageUpload.objects.filter(user=self.request.user).order_by('-timestamp')
\ No newline at end of file
+        return ImageUpload.objects.filter(user=self.request.user).order_by('-timestamp')
+
+class ModelStatsView(generics.GenericAPIView):
+    """API endpoint reporting model load statistics for this worker process"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        cache = get_prediction_cache()
+        return Response({
+            'models': registry.stats(),
+            'serving': get_model_server().stats(),
+            'prediction_cache': cache.stats() if cache is not None else None,
+        })
+
+
+
+class ReadinessView(generics.GenericAPIView):
+    """API endpoint for load balancer readiness probes, 503 until warmup finished"""
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        if not warmup.is_ready():
+            warmup.start_background_warmup()
+            return Response(warmup.status(), status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(warmup.status())
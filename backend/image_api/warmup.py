@@ -0,0 +1,115 @@
+import gc
+import logging
+import threading
+import time
+
+from django.db import connections
+
+from .conf import get_setting
+from .model_registry import registry
+from .lazy import cv2, np
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+_state = {'running': False, 'error': None, 'seconds': None}
+_lock = threading.Lock()
+
+
+def warm_up(iterations=None):
+    """
+    Load every active model version and run dummy inferences through it
+
+    Called before the server forks its workers (see backend/gunicorn.conf.py)
+    so the weights, numpy, OpenCV and the nutrition table are loaded once in
+    the master and the workers share those pages instead of each paying a
+    cold start.
+
+    Args:
+        iterations: Dummy inferences per model, defaults to WARMUP_ITERATIONS
+    """
+    from .dish_search import get_dish_index
+    from .nutrition import get_nutrition_table
+    from .recommendations import get_neighbour_index
+    from .prediction import decode_image, get_model_server, get_nutrition_by_dish
+
+    iterations = iterations or get_setting('WARMUP_ITERATIONS')
+    started = time.perf_counter()
+    _state['running'] = True
+    try:
+        server = get_model_server()
+        imgsz = server.input_size()
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+
+        # Exercise the JPEG decoder, the nutrition table and the dish indexes once
+        encoded = cv2.imencode('.jpg', dummy)[1].tobytes()
+        decode_image(encoded, target_size=imgsz)
+        get_nutrition_by_dish('')
+        get_dish_index()
+        get_neighbour_index()
+
+        # Run the models directly rather than through the batching engines,
+        # whose worker threads must only be started after the fork
+        for version in server.active_versions():
+            # Align the nutrient matrix to each model's classes up front
+            get_nutrition_table().class_matrix(server.class_names(version))
+            with registry.use_model(server.versions[version]) as model:
+                for _ in range(iterations):
+                    model.predict(dummy, verbose=False)
+    except Exception as exc:
+        logger.exception("Model warmup failed")
+        _state['error'] = str(exc)
+        return False
+    finally:
+        _state['running'] = False
+        # The dish catalog is read from the database. In a preloading master
+        # the connection would be inherited by, and shared between, all
+        # forked workers, so it is closed before they are forked
+        connections.close_all()
+
+    _state['error'] = None
+    _state['seconds'] = time.perf_counter() - started
+    _ready.set()
+    logger.info("Model warmup finished in %.2fs", _state['seconds'])
+    return True
+
+
+def preload():
+    """
+    Warm up at application import if PRELOAD_MODEL is enabled
+
+    Afterwards everything allocated so far is moved out of the garbage
+    collector's reach with gc.freeze(), so collections in forked workers do
+    not write to (and thereby copy) the shared pages.
+    """
+    if not get_setting('PRELOAD_MODEL'):
+        return
+    if warm_up():
+        gc.freeze()
+
+
+def start_background_warmup():
+    """
+    Warm up in a background thread unless ready or already warming up
+
+    A failed warmup is retried on the next call, e.g. once the weights have
+    been copied into place.
+    """
+    with _lock:
+        if _ready.is_set() or _state['running']:
+            return
+        _state['running'] = True
+    threading.Thread(target=warm_up, name='model-warmup', daemon=True).start()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def status():
+    return {
+        'ready': _ready.is_set(),
+        'warming_up': _state['running'],
+        'warmup_seconds': _state['seconds'],
+        'error': _state['error'],
+    }
@@ -48,7 +48,29 @@ def preprocess_image(image_path):
     
     return image
 
-def predict_food(model, image, conf_threshold=0.25):
+def top_k_classes(probs, top_k):
+    """
+    Indices and probabilities of the k most likely classes
+    
+    Uses argpartition so only the k selected entries are sorted.
+    
+    Args:
+        probs: Class probability vector (torch tensor or numpy array)
+        top_k: Number of classes to return
+        
+    Returns:
+        Tuple of (class indices, probabilities), best first
+    """
+    if hasattr(probs, "cpu"):
+        probs = probs.cpu().numpy()
+    probs = np.asarray(probs).ravel()
+    top_k = max(1, min(int(top_k), probs.size))
+    
+    indices = np.argpartition(probs, -top_k)[-top_k:]
+    indices = indices[np.argsort(probs[indices])[::-1]]
+    return indices, probs[indices]
+
+def predict_food(model, image, conf_threshold=0.25, top_k=5):
     """
     Predict food class for an image
     
@@ -56,6 +78,7 @@ def predict_food(model, image, conf_threshold=0.25):
         model: Trained YOLO model
         image: Input image (numpy array)
         conf_threshold: Confidence threshold for predictions
+        top_k: Number of best classes to return
         
     Returns:
         Dictionary with prediction results
@@ -64,12 +87,11 @@ def predict_food(model, image, conf_threshold=0.25):
     results = model.predict(image, conf=conf_threshold)
     result = results[0]  # Get first result (only one image)
     
-    # Process predictions
+    # Only the k best classes are converted and get nutrition attached
+    indices, confidences = top_k_classes(result.probs.data, top_k)
     predictions = []
-    for i, prob in enumerate(result.probs.data):
-        class_id = int(i)
+    for class_id, confidence in zip(indices.tolist(), confidences.tolist()):
         class_name = result.names[class_id]
-        confidence = float(prob)
         
         # Get nutrition info if available
         nutrition = NUTRITION_INFO.get(class_name, {
@@ -86,15 +108,12 @@ def predict_food(model, image, conf_threshold=0.25):
             "nutrition": nutrition
         })
     
-    # Sort by confidence
-    predictions.sort(key=lambda x: x["confidence"], reverse=True)
-    
     return {
         "top_prediction": predictions[0] if predictions else None,
-        "all_predictions": predictions
+        "top_predictions": predictions
     }
 
-def process_image_file(model, image_path, output_dir=None, save_json=False):
+def process_image_file(model, image_path, output_dir=None, save_json=False, top_k=5):
     """
     Process a single image file
     
@@ -103,6 +122,7 @@ def process_image_file(model, image_path, output_dir=None, save_json=False):
         image_path: Path to the image
         output_dir: Directory to save visualization results
         save_json: Whether to save results as JSON
+        top_k: Number of best classes to return
         
     Returns:
         Dictionary with prediction results
@@ -113,7 +133,7 @@ def process_image_file(model, image_path, output_dir=None, save_json=False):
     image = preprocess_image(image_path)
     
     # Make prediction
-    predictions = predict_food(model, image)
+    predictions = predict_food(model, image, top_k=top_k)
     
     # Display results
     top_pred = predictions["top_prediction"]
@@ -144,6 +164,7 @@ def main():
     parser.add_argument('--output-dir', type=str, default='../results', help='Output directory')
     parser.add_argument('--save-json', action='store_true', help='Save results as JSON')
     parser.add_argument('--conf-threshold', type=float, default=0.25, help='Confidence threshold')
+    parser.add_argument('--top-k', type=int, default=5, help='Number of best classes to report')
     
     args = parser.parse_args()
     
@@ -155,7 +176,8 @@ def main():
         model=model, 
         image_path=args.image, 
         output_dir=args.output_dir,
-        save_json=args.save_json
+        save_json=args.save_json,
+        top_k=args.top_k
     )
 
 if __name__ == "__main__":